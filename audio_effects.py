@@ -0,0 +1,96 @@
+import numpy as np
+
+from audio_mix import db_to_gain
+
+# 最後の字幕にかけるエコーの設定
+# pre_delay_ms/pre_delay_gain_db: 自分自身を pre_delay_ms 遅らせて重ね、重なっている間の原音を pre_delay_gain_db 下げる
+# taps: (遅延ms, 減衰率) を順番に掛け合わせる多段ディレイ
+# normalize: 'peak' は最大振幅がフルスケールになるように正規化、'clip' は超えた分だけ切る、None は何もしない
+CLOSING_ECHO = {
+    'pre_delay_ms': 100,
+    'pre_delay_gain_db': -6,
+    'taps': [(45, 0.3), (75, 0.2), (105, 0.15)],
+    'normalize': 'peak',
+}
+
+# タップ数がこれを超えたらFFTで畳み込む
+SPARSE_TAP_LIMIT = 64
+
+
+def cascade_impulse_response(taps, frame_rate):
+    """(遅延ms, 減衰率) の多段ディレイを1つのインパルス応答 (遅延フレームの配列, ゲインの配列) にまとめる
+
+    各段は直前までの出力に遅延音を足す (1 + g·z^-d) なので、全体はその積になる。
+    """
+    response = {0: 1.0}
+    for delay_ms, decay in taps:
+        delay = int(delay_ms * frame_rate / 1000)
+        next_response = dict(response)
+        for offset, gain in response.items():
+            next_response[offset + delay] = next_response.get(offset + delay, 0.0) + gain * decay
+        response = next_response
+    delays = np.array(sorted(response), dtype=np.int64)
+    gains = np.array([response[delay] for delay in delays], dtype=np.float32)
+    return delays, gains
+
+
+def sparse_fir(samples, delays, gains):
+    # 疎なFIRをチャンネルごとに一度に適用する。一時配列は入力と同じ大きさのもの1つだけ
+    output = np.zeros_like(samples)
+    scratch = np.empty_like(samples)
+    length = len(samples)
+    for delay, gain in zip(delays, gains):
+        if delay >= length:
+            continue
+        np.multiply(samples[:length - delay], gain, out=scratch[:length - delay])
+        output[delay:] += scratch[:length - delay]
+    return output
+
+
+def fft_fir(samples, delays, gains, block_frames=1 << 16):
+    # インパルス応答が長い（タップが多い）場合はブロックごとのFFT畳み込み（overlap-add）で適用する
+    impulse = np.zeros(int(delays[-1]) + 1, dtype=np.float64)
+    np.add.at(impulse, delays, gains)
+    length = len(samples)
+    fft_size = 1 << int(np.ceil(np.log2(block_frames + len(impulse) - 1)))
+    impulse_spectrum = np.fft.rfft(impulse, fft_size)
+    output = np.zeros_like(samples)
+    for start in range(0, length, block_frames):
+        block = samples[start:start + block_frames]
+        spectrum = np.fft.rfft(block, fft_size, axis=0)
+        convolved = np.fft.irfft(spectrum * impulse_spectrum[:, None], fft_size, axis=0)
+        end = min(start + fft_size, length)
+        output[start:end] += convolved[:end - start].astype(samples.dtype)
+    return output
+
+
+def apply_fir(samples, delays, gains):
+    if len(delays) > SPARSE_TAP_LIMIT:
+        return fft_fir(samples, delays, gains)
+    return sparse_fir(samples, delays, gains)
+
+
+def apply_echo(samples, frame_rate, settings=CLOSING_ECHO):
+    """(フレーム数, チャンネル数) のfloat32配列にエコーをかけて同じ長さの配列を返す（値はint16のスケール）"""
+    samples = np.asarray(samples, dtype=np.float32)
+    length = len(samples)
+    pre_delay = int(settings.get('pre_delay_ms', 0) * frame_rate / 1000)
+    if 0 < pre_delay < length:
+        # 自分自身を遅らせて重ね、重なっている区間だけ原音を下げる
+        mixed = samples.copy()
+        mixed[pre_delay:] *= np.float32(db_to_gain(settings.get('pre_delay_gain_db', 0)))
+        mixed[pre_delay:] += samples[:length - pre_delay]
+        samples = mixed
+
+    delays, gains = cascade_impulse_response(settings.get('taps', []), frame_rate)
+    output = apply_fir(samples, delays, gains)
+
+    normalize = settings.get('normalize')
+    if normalize == 'peak':
+        # 最大振幅がint16のフルスケールになるように正規化
+        peak = np.max(np.abs(output)) if length else 0
+        if peak > 0:
+            output *= np.float32(32767 / peak)
+    elif normalize == 'clip':
+        np.clip(output, -32768, 32767, out=output)
+    return output
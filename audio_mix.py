@@ -0,0 +1,117 @@
+import numpy as np
+from pydub import AudioSegment
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+def segment_to_array(segment, frame_rate, channels):
+    # pydubのoverlayと同じようにサンプリングレートとチャンネル数を揃え、(フレーム数, チャンネル数) のint16配列にする
+    segment = segment.set_channels(channels).set_frame_rate(frame_rate).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, channels)
+
+
+def common_format(segments, frame_rate=0, channels=0):
+    # AudioSegment同士を重ねるときと同様に、最も高いレート・多いチャンネル数に合わせる
+    for segment in segments:
+        frame_rate = max(frame_rate, segment.frame_rate)
+        channels = max(channels, segment.channels)
+    return frame_rate, channels
+
+
+class AudioMixer:
+    """float32のタイムラインを1本だけ確保し、音声を指定位置へ直接足し込んでいくミキサー
+
+    AudioSegment.overlay と違ってトラック全体のコピーが発生しないので、
+    クリップ数が多くても全体の長さに比例した時間で合成できる。
+    """
+
+    def __init__(self, duration_ms, frame_rate, channels):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.buffer = np.zeros((self.ms_to_frames(duration_ms), channels), dtype=np.float32)
+
+    @classmethod
+    def from_segment(cls, segment, frame_rate=None, channels=None):
+        frame_rate = frame_rate or segment.frame_rate
+        channels = channels or segment.channels
+        mixer = cls(0, frame_rate, channels)
+        mixer.buffer = segment_to_array(segment, frame_rate, channels).astype(np.float32)
+        return mixer
+
+    def ms_to_frames(self, ms):
+        return int(ms * self.frame_rate / 1000)
+
+    def __len__(self):
+        # AudioSegmentと同じくミリ秒単位の長さ
+        return round(1000 * len(self.buffer) / self.frame_rate)
+
+    def add(self, samples, position_ms=0, gain_db=0.0):
+        # samples: (フレーム数, チャンネル数) の配列。タイムラインからはみ出す部分は切り捨てる
+        start = self.ms_to_frames(position_ms)
+        if start >= len(self.buffer):
+            return
+        end = min(start + len(samples), len(self.buffer))
+        target = self.buffer[start:end]
+        if gain_db:
+            target += samples[:end - start] * np.float32(db_to_gain(gain_db))
+        else:
+            target += samples[:end - start]
+
+    def add_looped(self, samples, gain_db=0.0, envelope=None):
+        # samples を先頭から繰り返してタイムライン全体に敷く（BGM用）。一時配列は samples 1周分まで
+        if len(samples) == 0:
+            return
+        gain = np.float32(db_to_gain(gain_db))
+        for start in range(0, len(self.buffer), len(samples)):
+            end = min(start + len(samples), len(self.buffer))
+            chunk = samples[:end - start] * gain
+            if envelope is not None:
+                chunk *= envelope.gain(start, end)[:, None]
+            self.buffer[start:end] += chunk
+
+    def add_segment(self, segment, position_ms=0, gain_db=0.0):
+        self.add(segment_to_array(segment, self.frame_rate, self.channels), position_ms, gain_db)
+
+    def to_array(self):
+        # 最後に一度だけint16の範囲にクリップする
+        return np.clip(self.buffer, -32768, 32767).astype(np.int16)
+
+    def to_segment(self):
+        return AudioSegment(self.to_array().tobytes(), frame_rate=self.frame_rate, sample_width=2, channels=self.channels)
+
+    def export(self, path, format="wav"):
+        return self.to_segment().export(path, format=format)
+
+
+class DuckingEnvelope:
+    """ナレーションの音量からBGMを下げるゲインを求める（サイドチェイン・ダッキング）
+
+    ナレーションを window_ms ごとのブロックに分けてピークを測り、threshold_db を超えたブロックと
+    その後 release_ms の間は duck_db だけ下げる。切り替わりは attack_ms の移動平均でなめらかにする。
+    """
+
+    def __init__(self, narration, frame_rate, duck_db=-8.0, threshold_db=-40.0, window_ms=50, attack_ms=100, release_ms=300):
+        block = max(1, int(frame_rate * window_ms / 1000))
+        starts = np.arange(0, len(narration), block)
+        if len(starts) == 0:
+            self.centers = np.zeros(1)
+            self.gains = np.ones(1)
+            return
+        # ブロックごとのピーク（全チャンネルの最大値）
+        peaks = np.maximum.reduceat(np.abs(narration).max(axis=1), starts)
+        active = peaks > 32768 * db_to_gain(threshold_db)
+        # 話し終わってもしばらく下げたままにする
+        hold = max(1, int(release_ms / window_ms))
+        active = np.convolve(active.astype(np.float32), np.ones(hold + 1, dtype=np.float32))[:len(active)] > 0
+        gains = np.where(active, db_to_gain(duck_db), 1.0)
+        smooth = max(1, int(attack_ms / window_ms))
+        if smooth > 1:
+            gains = np.convolve(np.pad(gains, (smooth // 2, smooth - 1 - smooth // 2), mode='edge'), np.ones(smooth) / smooth, mode='valid')
+        self.centers = starts + block / 2
+        self.gains = gains
+
+    def gain(self, start, end):
+        # フレーム start から end までの各フレームのゲイン
+        return np.interp(np.arange(start, end), self.centers, self.gains).astype(np.float32)
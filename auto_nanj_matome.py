@@ -1,33 +1,30 @@
-import subprocess
+import argparse
 import os
-import sys  # sys モジュールをインポート
+import perf_trace
+from pipeline import Pipeline, Stage
+from stage_runner import SCRIPT_DIR, InProcessRunner, SubprocessRunner, job_paths
 
-def run_make_srt():
-    subprocess.run([sys.executable, 'make_srt.py'], check=True)
-
-def run_make_emo_analysis():
-    subprocess.run([sys.executable, 'make_emo_analysis.py'], check=True)
-
-def run_make_audio():
-    # sys.executable を使用して現在の Python インタープリタのパスを取得
-    subprocess.run([sys.executable, 'make_audio.py'], check=True)
-
-def run_make_movie_text():
-    subprocess.run([sys.executable, 'make_movie_text.py'], check=True)
-
-def run_make_thumbnail():
-    subprocess.run([sys.executable, 'make_thumbnail.py'], check=True)
-
-def set_thumbnail_to_video(thumbnail_path, video_path, output_path):
-    subprocess.run(['ffmpeg', '-i', video_path, '-i', thumbnail_path, '-map', '0', '-map', '1', '-c', 'copy', '-disposition:v:1', 'attached_pic', '-y', output_path], check=True)
+# 各ステージが実行するスクリプトと、そこから使っているモジュール（変わったらそのステージを作り直す）
+# どのディレクトリから実行しても同じファイルを見るように、スクリプトのあるディレクトリからのパスにする
+STAGE_SOURCES = {
+    stage: [os.path.join(SCRIPT_DIR, name) for name in names]
+    for stage, names in {
+        'srt': ['make_srt.py', 'tts_cache.py', 'tts_client.py'],
+        'emo': ['make_emo_analysis.py', 'emo_cache.py'],
+        'audio': ['make_audio.py', 'tts_cache.py', 'tts_client.py', 'audio_mix.py', 'audio_effects.py', 'se_bank.py'],
+        'thumbnail': ['make_thumbnail.py', 'text_layout.py'],
+        'movie': ['make_movie_text.py', 'bg_source.py', 'interval_index.py', 'text_layout.py', 'emo_assets.py',
+                  'static_layers.py', 'encoder_profiles.py'],
+    }.items()
+}
 
 def cleanup_files(keep_files, generated_files):
     for filename in os.listdir('.'):
         if filename not in keep_files and filename in generated_files:
             os.remove(filename)
 
-def get_video_title_from_input():
-    with open('input.txt', 'r', encoding='utf-8') as file:
+def get_video_title_from_input(input_path='input.txt'):
+    with open(input_path, 'r', encoding='utf-8') as file:
         for line in file:
             if line.startswith('#'):
                 title = line.strip()[1:].strip()
@@ -35,23 +32,56 @@ def get_video_title_from_input():
                 return f"{title}.mp4"
     return "default_video_title.mp4"
 
-if __name__ == "__main__":
-    generated_files_after_srt = ['output.srt', 'SE.txt']
-    generated_files_after_audio = ['output.wav', 'final_output_with_bgm.wav', 'output_with_se.wav']
-    generated_files_after_movie_text = ['video_from_srt.mp4', 'output_with_audio.mp4']
+def build_stages(paths, runner):
+    # 各ステージの入力（スクリプト自身と使っているモジュールも含む）と出力
+    # 入力の内容が前回成功したときと同じで出力も残っていれば、そのステージは実行しない
+    return [
+        Stage('srt', lambda: runner.srt(paths),
+              inputs=[paths['input']] + STAGE_SOURCES['srt'],
+              outputs=[paths['srt'], paths['se_list']]),
+        Stage('emo', lambda: runner.emo(paths),
+              inputs=[paths['srt']] + STAGE_SOURCES['emo'],
+              outputs=[paths['emo']],
+              deps=['srt'],
+              # EMO_MODEL_PATH などで別のモデルに切り替えたときも作り直す
+              params=runner.emo_model),
+        Stage('audio', lambda: runner.audio(paths),
+              inputs=[paths['srt'], paths['se_list'], paths['bgm'], paths['se_folder']] + STAGE_SOURCES['audio'],
+              outputs=[paths['narration'], paths['bgm_mix'], paths['audio']],
+              deps=['srt']),
+        Stage('thumbnail', lambda: runner.thumbnail(paths),
+              inputs=[paths['input'], paths['thumbnail_background'], paths['watermark'], paths['font']] + STAGE_SOURCES['thumbnail'],
+              outputs=[paths['thumbnail']]),
+        # 映像・音声・サムネイルを1回で書き出すので、音声とサムネイルの後に実行する
+        Stage('movie', lambda: runner.movie(paths),
+              inputs=[paths['srt'], paths['emo'], paths['audio'], paths['thumbnail'], paths['background'],
+                      paths['emoimages'], paths['font']] + STAGE_SOURCES['movie'],
+              outputs=[paths['video']],
+              deps=['emo', 'audio', 'thumbnail']),
+    ]
 
-    run_make_srt()
-    run_make_emo_analysis()
-
-    run_make_audio()
-
-    run_make_movie_text()
-
-    # サムネイル生成を実行
-    run_make_thumbnail()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='なんJまとめ動画を一通り作成します（入力が変わっていないステージは飛ばします）')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help='入力に変更がなくても実行するステージ（srt, emo, audio, thumbnail, movie, all）。複数指定可')
+    parser.add_argument('--subprocess', action='store_true',
+                        help='各ステージを別プロセスで実行する（既定では同じプロセス内でモジュールやモデルを共有して実行）')
+    parser.add_argument('--jobs', type=int, default=3,
+                        help='依存関係のないステージ（感情分析・音声・サムネイル）を同時に実行する数。1で順番に実行')
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help='ステージ・TTS・フレーム描画・感情分析の所要時間を計測し、Chrome trace 形式のJSONに書き出す')
+    args = parser.parse_args()
 
     # タイトルを取得して最終出力ファイル名を設定
     final_video_title = get_video_title_from_input()
+    paths = job_paths(final_video_title)
+
+    if args.trace:
+        perf_trace.enable(args.trace)
 
-    # サムネイルを動画に設定し、最終出力を生成
-    set_thumbnail_to_video('youtube_thumbnail.png', 'output_with_audio.mp4', final_video_title)
\ No newline at end of file
+    runner = SubprocessRunner() if args.subprocess else InProcessRunner()
+    try:
+        Pipeline(build_stages(paths, runner)).run(force=args.force, max_workers=args.jobs)
+    finally:
+        runner.close()
+        perf_trace.save()
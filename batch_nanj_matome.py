@@ -0,0 +1,125 @@
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from auto_nanj_matome import build_stages, get_video_title_from_input
+import perf_trace
+from pipeline import Pipeline
+from stage_runner import InProcessRunner, SubprocessRunner, job_paths
+
+
+def collect_threads(sources, queue_path=None):
+    # ディレクトリなら中の .txt を名前順に、ファイルならそのまま使う。キューファイルには1行に1つパスを書く
+    thread_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            thread_paths.extend(os.path.join(source, f) for f in sorted(os.listdir(source)) if f.endswith('.txt'))
+        else:
+            thread_paths.append(source)
+    if queue_path:
+        with open(queue_path, 'r', encoding='utf-8') as queue_file:
+            thread_paths.extend(line.strip() for line in queue_file if line.strip() and not line.startswith('#'))
+    return thread_paths
+
+
+def job_names(thread_paths):
+    # ファイル名（拡張子なし）をジョブ名にする。同じ名前が重なったら連番を付ける
+    names = []
+    used = set()
+    for thread_path in thread_paths:
+        base = os.path.splitext(os.path.basename(thread_path))[0]
+        name = base
+        suffix = 2
+        while name in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def prepare_workspace(thread_path, workspace):
+    # ジョブごとの作業ディレクトリに input.txt として置く（内容が同じなら触らない）
+    os.makedirs(workspace, exist_ok=True)
+    input_path = os.path.join(workspace, 'input.txt')
+    if not os.path.exists(input_path) or not filecmp.cmp(thread_path, input_path, shallow=False):
+        shutil.copyfile(thread_path, input_path)
+    return input_path
+
+
+def run_job(name, thread_path, jobs_dir, assets_dir, runner, force=(), stage_jobs=1):
+    """1つのスレッドを jobs_dir/<name>/ で動画にして、出力した動画のパスを返す"""
+    workspace = os.path.join(jobs_dir, name)
+    input_path = prepare_workspace(thread_path, workspace)
+    paths = job_paths(get_video_title_from_input(input_path), workdir=workspace, assets_dir=assets_dir)
+    pipeline = Pipeline(build_stages(paths, runner), state_path=os.path.join(workspace, 'cache', 'pipeline_state.json'), name=name)
+    pipeline.run(force=force, max_workers=stage_jobs)
+    return paths['video']
+
+
+def run_batch(thread_paths, jobs_dir='jobs', assets_dir='.', workers=2, stage_jobs=1, force=(), runner=None):
+    """スレッドのファイルをまとめて動画にし、ジョブごとの (名前, 成否, 所要時間, 出力かエラー) のリストを返す
+
+    runner を全ジョブで共有するので、同じプロセス内ならTTSクライアント・感情分析のモデル・各種キャッシュは一度だけ用意される。
+    """
+    if runner is None:
+        runner = InProcessRunner()
+
+    def job(name, thread_path):
+        started = time.perf_counter()
+        try:
+            video_path = run_job(name, thread_path, jobs_dir, assets_dir, runner, force, stage_jobs)
+            return name, True, time.perf_counter() - started, video_path
+        except Exception as e:
+            traceback.print_exc()
+            return name, False, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='job') as pool:
+        futures = [pool.submit(job, name, thread_path) for name, thread_path in zip(job_names(thread_paths), thread_paths)]
+        return [future.result() for future in futures]
+
+
+def print_summary(results):
+    print("ジョブ                 結果   所要時間  出力/エラー")
+    for name, ok, seconds, detail in results:
+        print(f"{name:<20} {'成功' if ok else '失敗'}  {seconds:8.1f}s  {detail}")
+    succeeded = sum(1 for _, ok, _, _ in results if ok)
+    print(f"成功 {succeeded} / 失敗 {len(results) - succeeded} / 合計 {len(results)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='複数のスレッドをジョブごとの作業ディレクトリでまとめて動画にします')
+    parser.add_argument('sources', nargs='*', help='スレッドのファイル（input.txt と同じ形式）か、それらを入れたディレクトリ')
+    parser.add_argument('--queue', default=None, help='スレッドのファイルのパスを1行に1つ書いたファイル')
+    parser.add_argument('--jobs-dir', default='jobs', help='ジョブごとの作業ディレクトリを作る場所（jobs/<名前>/）')
+    parser.add_argument('--assets-dir', default='.', help='BGM・SE・背景などの共有素材があるディレクトリ')
+    parser.add_argument('--workers', type=int, default=2, help='同時に処理するジョブの数')
+    parser.add_argument('--stage-jobs', type=int, default=1, help='1つのジョブの中で同時に実行するステージの数')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help='入力に変更がなくても実行するステージ（srt, emo, audio, thumbnail, movie, all）。複数指定可')
+    parser.add_argument('--subprocess', action='store_true',
+                        help='各ステージを別プロセスで実行する（モデルやTTSクライアントはジョブ間で共有されない）')
+    parser.add_argument('--trace', default=None, metavar='PATH',
+                        help='ステージ・TTS・フレーム描画・感情分析の所要時間を計測し、Chrome trace 形式のJSONに書き出す')
+    args = parser.parse_args()
+
+    thread_paths = collect_threads(args.sources, args.queue)
+    if not thread_paths:
+        parser.error('スレッドのファイルが指定されていません')
+
+    if args.trace:
+        perf_trace.enable(args.trace)
+
+    runner = SubprocessRunner() if args.subprocess else InProcessRunner()
+    try:
+        results = run_batch(thread_paths, args.jobs_dir, args.assets_dir, args.workers, args.stage_jobs, args.force, runner)
+    finally:
+        runner.close()
+        perf_trace.save()
+    print_summary(results)
+    sys.exit(0 if all(ok for _, ok, _, _ in results) else 1)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from encoder_profiles import PROFILES, is_available, output_args
+
+
+def bench_profile(profile_name, video_size, fps, duration, work_dir):
+    # 合成映像(testsrc2)をエンコードして、エンコード速度と出力ビットレートを測る
+    output_path = os.path.join(work_dir, f"{profile_name}.mp4")
+    ffmpeg_cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=s={video_size[0]}x{video_size[1]}:r={fps}:d={duration}",
+    ] + output_args(profile_name) + ['-y', output_path]
+    started = time.perf_counter()
+    subprocess.run(ffmpeg_cmd, check=True)
+    elapsed = time.perf_counter() - started
+    frames = int(fps * duration)
+    bitrate_kbps = os.path.getsize(output_path) * 8 / duration / 1000
+    return {'profile': profile_name, 'seconds': elapsed, 'fps': frames / elapsed, 'bitrate_kbps': bitrate_kbps}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='エンコードプロファイルごとの速度とビットレートを比較する')
+    arg_parser.add_argument('--profiles', nargs='*', default=list(PROFILES))
+    arg_parser.add_argument('--size', default='1280x720')
+    arg_parser.add_argument('--fps', type=int, default=24)
+    arg_parser.add_argument('--duration', type=float, default=10)
+    args = arg_parser.parse_args()
+    video_size = tuple(int(v) for v in args.size.split('x'))
+
+    print(f"{'profile':<16}{'encode fps':>12}{'bitrate(kbps)':>16}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for profile_name in args.profiles:
+            if not is_available(profile_name):
+                print(f"{profile_name:<16}{'(使用不可)':>12}")
+                continue
+            result = bench_profile(profile_name, video_size, args.fps, args.duration, work_dir)
+            print(f"{profile_name:<16}{result['fps']:>12.1f}{result['bitrate_kbps']:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import wave
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+import perf_trace
+from auto_nanj_matome import build_stages, get_video_title_from_input
+from emo_assets import AVATAR_SIZE
+from encoder_profiles import select_profile
+from make_emo_analysis import EMOTIONS
+from pipeline import Pipeline
+from stage_runner import SCRIPT_DIR, InProcessRunner, SubprocessRunner, job_paths
+from stub_tts_server import StubTTSServer
+from text_layout import FONT_PATH
+
+# 合成スレッドに使う文（読み上げの長さがばらつくように長さを変えてある）
+PHRASES = [
+    "草", "それな", "ワロタ", "これは流石にワロタ", "ほんまか？", "なんでや！", "せやな",
+    "ワイもそう思うで", "AIが作った動画らしいで", "今日の晩飯はカレーやった", "明日は休みやから夜更かしするで",
+    "ファッ！？", "ええやん", "しゃーない", "これもう分からんね", "昔はこんなんなかったよな",
+    "YouTubeで見たことあるわ", "ワイの地元でも話題になっとるで", "いや普通に考えておかしいやろ",
+]
+
+
+def make_thread(comments, max_replies, seed=0):
+    """format.txt と同じ形式の合成スレッドを作る（同じ引数なら毎回同じ内容）"""
+    rng = random.Random(seed)
+    lines = [f"# ベンチマーク用スレッド{seed}"]
+    for i in range(comments):
+        lines.append(f"< {rng.choice(PHRASES)}{rng.choice(PHRASES)}")
+        # サムネイルに最初の返信を使うので、1つ目のコメントには必ず返信を付ける
+        replies = max(1, max_replies) if i == 0 else rng.randint(0, max_replies)
+        for _ in range(replies):
+            lines.append(f">> {rng.choice(PHRASES)}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_wav(path, samples, frame_rate):
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(samples.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(samples.astype(np.int16).tobytes())
+
+
+def avatar_color(index):
+    # 感情ごとの合成画像の顔の色
+    hue = index * 255 // len(EMOTIONS)
+    return (hue, 255 - hue, 160)
+
+
+def make_fixtures(assets_dir, video_size=(1280, 720), bg_seconds=10):
+    """背景動画・BGM・SE・感情画像・サムネイル背景・透かし画像を assets_dir に作る（既にあれば作り直さない）"""
+    os.makedirs(assets_dir, exist_ok=True)
+
+    background_path = os.path.join(assets_dir, 'background.mp4')
+    if not os.path.exists(background_path):
+        subprocess.run([
+            'ffmpeg', '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=s={video_size[0]}x{video_size[1]}:r=30:d={bg_seconds}",
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-y', background_path,
+        ], check=True)
+
+    bgm_path = os.path.join(assets_dir, 'BGM.wav')
+    if not os.path.exists(bgm_path):
+        # 和音をゆっくり揺らした30秒のステレオ
+        frame_rate = 44100
+        t = np.arange(30 * frame_rate) / frame_rate
+        chord = sum(np.sin(2 * np.pi * f * t) for f in (261.6, 329.6, 392.0)) / 3
+        left = chord * (0.6 + 0.4 * np.sin(2 * np.pi * 0.2 * t))
+        right = chord * (0.6 + 0.4 * np.cos(2 * np.pi * 0.2 * t))
+        write_wav(bgm_path, np.stack([left, right], axis=1) * 8000, frame_rate)
+
+    # SEBank は .mp3 だけを読むので、SEはMP3で作る
+    for se_type, frequency in (('title', 880), ('comment', 660), ('reply', 440)):
+        se_path = os.path.join(assets_dir, 'SE', se_type, 'se.mp3')
+        if not os.path.exists(se_path):
+            os.makedirs(os.path.dirname(se_path), exist_ok=True)
+            subprocess.run([
+                'ffmpeg', '-hide_banner', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f"sine=frequency={frequency}:duration=0.4",
+                '-c:a', 'libmp3lame', '-y', se_path,
+            ], check=True)
+
+    for index, emotion in enumerate(EMOTIONS):
+        image_path = os.path.join(assets_dir, 'emoimages', emotion, 'stub.png')
+        if not os.path.exists(image_path):
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            image = Image.new('RGBA', (400, 400), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(image)
+            draw.ellipse((20, 20, 380, 380), fill=avatar_color(index) + (255,))
+            draw.ellipse((120, 140, 170, 190), fill=(0, 0, 0, 255))
+            draw.ellipse((230, 140, 280, 190), fill=(0, 0, 0, 255))
+            image.save(image_path)
+
+    thumbnail_background_path = os.path.join(assets_dir, 'thumbnail_background', 'stub.png')
+    if not os.path.exists(thumbnail_background_path):
+        os.makedirs(os.path.dirname(thumbnail_background_path), exist_ok=True)
+        gradient = np.linspace(0, 255, 1280, dtype=np.uint8)
+        pixels = np.stack([np.tile(gradient, (720, 1)), np.full((720, 1280), 96, np.uint8), np.tile(gradient[::-1], (720, 1))], axis=2)
+        Image.fromarray(pixels, 'RGB').save(thumbnail_background_path)
+
+    watermark_path = os.path.join(assets_dir, 'nanj.png')
+    if not os.path.exists(watermark_path):
+        image = Image.new('RGBA', (400, 400), (0, 0, 0, 0))
+        ImageDraw.Draw(image).rectangle((40, 40, 360, 360), fill=(255, 255, 255, 255))
+        image.save(watermark_path)
+
+
+class StubEmotionClassifier:
+    """モデルを読み込まずにテキストのハッシュで感情を決める（torch がない環境や、モデル以外を測りたいとき用）"""
+
+    cache_id = 'stub'
+
+    def classify_with_logits(self, texts, batch_size=16):
+        results = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode('utf-8')).digest()
+            logits = [value / 255 for value in digest[:len(EMOTIONS)]]
+            results.append((EMOTIONS[logits.index(max(logits))], logits))
+        return results
+
+
+class BenchRunner(InProcessRunner):
+    def __init__(self, stub_emotion=False):
+        super().__init__()
+        self.stub_emotion = stub_emotion
+
+    def emo_model(self):
+        return StubEmotionClassifier.cache_id if self.stub_emotion else super().emo_model()
+
+    def emo(self, paths):
+        if not self.stub_emotion:
+            return super().emo(paths)
+        import make_emo_analysis
+        make_emo_analysis.process_srt_pysrt(paths['srt'], paths['emo'], classifier=StubEmotionClassifier(), use_cache=False)
+
+
+def has_avatar_frames(video_path, video_size=(1280, 720), tolerance=40):
+    """出力動画の右上（感情画像の位置）に、合成した感情画像の顔と目が映っているフレームがあるか"""
+    # 感情画像は右上から10px内側に置かれ、左右反転されている。顔の中心と片方の目の位置の色を見る
+    left = video_size[0] - AVATAR_SIZE - 10
+    face = (left + AVATAR_SIZE // 2, 10 + AVATAR_SIZE // 2)
+    eye = (left + AVATAR_SIZE * 145 // 400, 10 + AVATAR_SIZE * 165 // 400)
+    colors = [np.array(avatar_color(index)) for index in range(len(EMOTIONS))]
+
+    def mean_rgb(frame, center):
+        x, y = center
+        return frame[y - 3:y + 3, x - 3:x + 3].reshape(-1, 3).mean(axis=0)[::-1]
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                return False
+            face_rgb = mean_rgb(frame, face)
+            if mean_rgb(frame, eye).max() <= tolerance and any(np.abs(face_rgb - color).max() <= tolerance for color in colors):
+                return True
+    finally:
+        cap.release()
+
+
+def run_once(runner, font_path, stage_jobs, assets_dir):
+    # 全ステージを強制的に実行し、ステージごとと全体の所要時間(秒)を返す
+    paths = job_paths(get_video_title_from_input(os.path.join('job', 'input.txt')), workdir='job', assets_dir=assets_dir, font_path=font_path)
+    pipeline = Pipeline(build_stages(paths, runner), state_path=os.path.join('job', 'cache', 'pipeline_state.json'))
+    started = time.perf_counter()
+    pipeline.run(force=['all'], max_workers=stage_jobs)
+    result = {name: end - start for name, (start, end, _) in pipeline.timings.items()}
+    result['total'] = time.perf_counter() - started
+    # 感情画像の読み込みと合成まで測れていなければ、結果として残さない
+    if not has_avatar_frames(paths['video']):
+        raise RuntimeError(f"感情画像が合成されたフレームがありません（{paths['emoimages']} が使われていません）")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(history_path, config):
+    # 同じ条件で測った過去の結果だけを比較に使う
+    if not os.path.exists(history_path):
+        return []
+    records = []
+    with open(history_path, 'r', encoding='utf-8') as history_file:
+        for line in history_file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('config') == config:
+                    records.append(record)
+    return records
+
+
+def flatten(runs):
+    return {f"{scenario}/{name}": seconds for scenario, result in runs.items() for name, seconds in result.items()}
+
+
+def compare(current, history, baseline_runs, threshold, min_seconds):
+    """直近 baseline_runs 回の中央値と比べ、遅くなった項目の名前のリストを返す"""
+    previous = [flatten(record['runs']) for record in history[-baseline_runs:]]
+    regressions = []
+    print(f"{'項目':<20}{'今回':>10}{'基準':>10}{'差':>9}")
+    for key, seconds in flatten(current).items():
+        values = [record[key] for record in previous if key in record]
+        if not values:
+            print(f"{key:<20}{seconds:>9.2f}s{'-':>10}{'-':>9}")
+            continue
+        baseline = statistics.median(values)
+        change = (seconds - baseline) / baseline if baseline > 0 else 0.0
+        regressed = change > threshold and seconds - baseline > min_seconds
+        mark = '  << 遅くなっています' if regressed else ''
+        print(f"{key:<20}{seconds:>9.2f}s{baseline:>9.2f}s{change:>+8.0%}{mark}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='スタブの音声APIと合成データでパイプライン全体とステージごとの時間を測る')
+    arg_parser.add_argument('--comments', type=int, default=20, help='合成スレッドのコメント数')
+    arg_parser.add_argument('--replies', type=int, default=2, help='コメントごとの返信の最大数')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--latency', type=float, default=0.2, help='スタブの音声APIの遅延(秒)')
+    arg_parser.add_argument('--jitter', type=float, default=0.1, help='テキストごとに加える最大の遅延(秒)')
+    arg_parser.add_argument('--port', type=int, default=5000, help='スタブの音声APIのポート（--subprocess のときは5000のみ）')
+    arg_parser.add_argument('--warm-runs', type=int, default=2, help='キャッシュが温まった状態で測る回数（中央値を記録）')
+    arg_parser.add_argument('--stage-jobs', type=int, default=3, help='同時に実行するステージの数')
+    arg_parser.add_argument('--font', default=FONT_PATH, help='字幕・サムネイルに使うフォント')
+    arg_parser.add_argument('--stub-emotion', action='store_true', help='感情分析のモデルを使わずハッシュで感情を決める')
+    arg_parser.add_argument('--subprocess', action='store_true', help='各ステージを別プロセスで実行する')
+    arg_parser.add_argument('--work-dir', default=None, help='作業ディレクトリ（省略時は一時ディレクトリ。指定すると素材を使い回す）')
+    arg_parser.add_argument('--history', default='bench_results.jsonl', help='結果を追記していくファイル')
+    arg_parser.add_argument('--baseline-runs', type=int, default=5, help='比較に使う過去の結果の数')
+    arg_parser.add_argument('--threshold', type=float, default=0.1, help='この割合より遅くなったら知らせる')
+    arg_parser.add_argument('--min-seconds', type=float, default=0.05, help='これより小さい差は無視する(秒)')
+    arg_parser.add_argument('--fail-on-regression', action='store_true', help='遅くなった項目があれば終了コード1で終わる')
+    arg_parser.add_argument('--trace', default=None, metavar='PATH', help='計測結果を Chrome trace 形式で書き出す')
+    args = arg_parser.parse_args()
+
+    if not os.path.exists(args.font):
+        arg_parser.error(f"フォントが見つかりません: {args.font}（--font で指定してください）")
+    if args.subprocess and (args.stub_emotion or args.port != 5000):
+        arg_parser.error('--subprocess のときは --stub-emotion と 5000 以外の --port は使えません')
+
+    history_path = os.path.abspath(args.history)
+    trace_path = os.path.abspath(args.trace) if args.trace else None
+    font_path = os.path.abspath(args.font)
+    config = {
+        'comments': args.comments, 'replies': args.replies, 'seed': args.seed,
+        'latency': args.latency, 'jitter': args.jitter, 'stage_jobs': args.stage_jobs,
+        'stub_emotion': args.stub_emotion, 'subprocess': args.subprocess, 'encoder': select_profile(),
+    }
+
+    temp_dir = None
+    work_dir = args.work_dir
+    if work_dir is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        work_dir = temp_dir.name
+    os.makedirs(work_dir, exist_ok=True)
+    original_dir = os.getcwd()
+    # 各種キャッシュ(cache/)も作業ディレクトリの中に作らせて、手元のキャッシュに影響されないようにする
+    os.chdir(work_dir)
+    try:
+        assets_dir = 'assets'
+        make_fixtures(assets_dir)
+        os.makedirs('job', exist_ok=True)
+        with open(os.path.join('job', 'input.txt'), 'w', encoding='utf-8') as input_file:
+            input_file.write(make_thread(args.comments, args.replies, args.seed))
+        if trace_path:
+            perf_trace.enable(trace_path)
+
+        runs = {}
+        with StubTTSServer(port=args.port, latency=args.latency, jitter=args.jitter) as server:
+            runner = SubprocessRunner() if args.subprocess else BenchRunner(args.stub_emotion)
+            try:
+                if not args.subprocess:
+                    runner.tts_client().api_url = server.url
+                # 1回目はキャッシュを消した状態で測る
+                shutil.rmtree('cache', ignore_errors=True)
+                runs['cold'] = run_once(runner, font_path, args.stage_jobs, assets_dir)
+                tts_requests = server.requests
+                warm = [run_once(runner, font_path, args.stage_jobs, assets_dir) for _ in range(args.warm_runs)]
+                if warm:
+                    runs['warm'] = {name: statistics.median(result[name] for result in warm) for name in warm[0]}
+            finally:
+                runner.close()
+        perf_trace.save()
+    finally:
+        os.chdir(original_dir)
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    history = load_history(history_path, config)
+    print(f"TTSリクエスト数(1回目): {tts_requests}")
+    regressions = compare(runs, history, args.baseline_runs, args.threshold, args.min_seconds)
+
+    record = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': config,
+        'tts_requests': tts_requests,
+        'runs': runs,
+    }
+    with open(history_path, 'a', encoding='utf-8') as history_file:
+        history_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    if regressions:
+        print(f"遅くなった項目: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
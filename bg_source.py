@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+
+import cv2
+
+import perf_trace
+
+
+class BackgroundSource:
+    """背景動画を先頭から順番にデコードし、出力フレームの時刻に合うフレームを先読みして渡す
+
+    フレームごとにシークするのではなく、必要なフレームまで読み進めて間引く（または同じフレームを繰り返す）。
+    動画の終わりに達したら先頭に戻ってループする。
+    """
+
+    def __init__(self, path, times, prefetch=48):
+        self.path = path
+        self.times = times
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='bg-decoder', daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # 読み出し側が止まった場合に抜けられるようにタイムアウト付きで待つ
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        cap = cv2.VideoCapture(self.path)
+        try:
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            bg_fps = cap.get(cv2.CAP_PROP_FPS)
+            if frame_count <= 0 or bg_fps <= 0:
+                return
+            frame_duration = 1.0 / bg_fps
+            position = -1  # 直前に読み込んだフレームの番号
+            frame = None
+            for current_time in self.times:
+                started = time.perf_counter()
+                target = int((current_time / frame_duration) % frame_count)
+                if position < 0 and target > 0:
+                    # 開始位置が途中の場合だけ最初に一度シークする
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    position = target - 1
+                elif target < position:
+                    # ループして先頭に戻る
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    position = -1
+                while position < target:
+                    ret, next_frame = cap.read()
+                    if not ret:
+                        if position < 0:
+                            return  # 1フレームもデコードできない
+                        # 実際のフレーム数がヘッダの値より少なかった場合は、それに合わせてループし直す
+                        frame_count = position + 1
+                        target = int((current_time / frame_duration) % frame_count)
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        position = -1
+                        continue
+                    frame = next_frame
+                    position += 1
+                # 1出力フレームぶんのデコード（間引いた分も含む）にかかった時間
+                perf_trace.complete('bg_decode', started, time.perf_counter(), 'frame')
+                if not self._put((current_time, frame)):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            cap.release()
+            self._put(None)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw
+
+DEFAULT_EMO_DIR = 'emoimages'
+DEFAULT_CACHE_DIR = os.path.join('cache', 'emoimages')
+AVATAR_SIZE = 250
+# 加工の手順を変えたらこの値を上げて、ディスク上のキャッシュを作り直させる
+PROCESS_VERSION = 1
+
+_avatars = {}
+_avatars_lock = threading.Lock()
+_indexes = {}
+
+
+def process_avatar(image_path):
+    # 300x300の円形に切り抜いて白背景に載せ、左右反転してから表示サイズに縮小する
+    image = Image.open(image_path).convert("RGBA")
+    image = image.resize((300, 300), Image.Resampling.LANCZOS)
+    mask = Image.new('L', (300, 300), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, 300, 300), fill=255)
+    alpha = image.split()[3]
+    alpha = ImageChops.multiply(alpha, mask)
+    image.putalpha(alpha)
+    background = Image.new('RGBA', (300, 300), (255, 255, 255, 255))
+    background.putalpha(mask)
+    background.paste(image, (0, 0), alpha)
+    background = background.transpose(Image.FLIP_LEFT_RIGHT)
+    return background.resize((AVATAR_SIZE, AVATAR_SIZE))
+
+
+def _cache_path(image_path, cache_dir):
+    # 元画像のパス・サイズ・更新時刻をキーにする
+    stat = os.stat(image_path)
+    payload = f"{os.path.abspath(image_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{PROCESS_VERSION}\0{AVATAR_SIZE}"
+    return os.path.join(cache_dir, hashlib.sha256(payload.encode('utf-8')).hexdigest() + '.png')
+
+
+def get_avatar(image_path, cache_dir=DEFAULT_CACHE_DIR):
+    """加工済みの感情画像を返す。1回の実行ではメモリに、実行をまたいではディスクにキャッシュする"""
+    image_path = str(image_path)
+    with _avatars_lock:
+        avatar = _avatars.get(image_path)
+    if avatar is not None:
+        return avatar
+
+    cache_path = _cache_path(image_path, cache_dir)
+    if os.path.exists(cache_path):
+        avatar = Image.open(cache_path).convert("RGBA")
+    else:
+        avatar = process_avatar(image_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.png', dir=cache_dir)
+        os.close(fd)
+        avatar.save(tmp_path, format='PNG')
+        os.replace(tmp_path, cache_path)
+    avatar.load()
+
+    with _avatars_lock:
+        _avatars[image_path] = avatar
+    return avatar
+
+
+def list_emotion_images(emotion, emo_dir=DEFAULT_EMO_DIR):
+    # emoimages/<感情>/ の画像一覧は1回の実行で一度だけ調べる
+    key = (emo_dir, emotion)
+    if key not in _indexes:
+        _indexes[key] = list((Path(emo_dir) / emotion).glob('*.png'))
+    return _indexes[key]
+
+
+def preload_avatars(image_paths, cache_dir=DEFAULT_CACHE_DIR):
+    for image_path in image_paths:
+        get_avatar(image_path, cache_dir)
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.path.join('cache', 'emotion.sqlite3')
+
+
+class EmotionCache:
+    """字幕テキストのハッシュ(+モデルID)から感情ラベルとlogitsを引くSQLiteキャッシュ"""
+
+    def __init__(self, model_id, db_path=DEFAULT_DB_PATH):
+        self.model_id = model_id
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS emotions ('
+            'key TEXT PRIMARY KEY, model_id TEXT NOT NULL, label TEXT NOT NULL, logits TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts):
+        # 見つかったものだけを {text: (label, logits)} で返す
+        found = {}
+        with self._lock:
+            for text in texts:
+                row = self._conn.execute('SELECT label, logits FROM emotions WHERE key = ?', (self.key(text),)).fetchone()
+                if row:
+                    found[text] = (row[0], json.loads(row[1]))
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, results):
+        # results: {text: (label, logits)}
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO emotions (key, model_id, label, logits) VALUES (?, ?, ?, ?)',
+                [(self.key(text), self.model_id, label, json.dumps(logits)) for text, (label, logits) in results.items()],
+            )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': hit_rate}
+
+    def report(self, label):
+        stats = self.stats()
+        print(f"[{label}] 感情キャッシュ: ヒット {stats['hits']} / ミス {stats['misses']} (ヒット率 {stats['hit_rate']:.1%})")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
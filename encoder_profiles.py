@@ -0,0 +1,84 @@
+import subprocess
+from functools import lru_cache
+
+# 名前付きのエンコード設定。output_args は FFmpeg の出力側オプション
+# サムネイルをカバーアート(2本目の映像ストリーム)として入れることがあるので、オプションは1本目の映像(v:0)だけに指定する
+PROFILES = {
+    'nvenc': {
+        'encoder': 'h264_nvenc',
+        'output_args': ['-c:v:0', 'h264_nvenc', '-pix_fmt:v:0', 'yuv420p'],
+    },
+    'x264_ultrafast': {
+        'encoder': 'libx264',
+        'output_args': ['-c:v:0', 'libx264', '-preset:v:0', 'ultrafast', '-crf:v:0', '23', '-pix_fmt:v:0', 'yuv420p'],
+    },
+    'x264_veryfast': {
+        'encoder': 'libx264',
+        'output_args': ['-c:v:0', 'libx264', '-preset:v:0', 'veryfast', '-crf:v:0', '23', '-pix_fmt:v:0', 'yuv420p'],
+    },
+    'x264_medium': {
+        'encoder': 'libx264',
+        'output_args': ['-c:v:0', 'libx264', '-preset:v:0', 'medium', '-crf:v:0', '23', '-pix_fmt:v:0', 'yuv420p'],
+    },
+    'x265': {
+        'encoder': 'libx265',
+        'output_args': ['-c:v:0', 'libx265', '-preset:v:0', 'medium', '-crf:v:0', '28', '-pix_fmt:v:0', 'yuv420p', '-tag:v:0', 'hvc1', '-x265-params:v:0', 'log-level=error'],
+    },
+}
+
+# 指定がない場合や指定したものが使えない場合に試す順番
+FALLBACK_ORDER = ['nvenc', 'x264_veryfast', 'x264_ultrafast', 'x264_medium', 'x265']
+
+
+@lru_cache(maxsize=None)
+def available_encoders():
+    # ffmpeg -encoders の一覧からエンコーダ名を集める
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return frozenset()
+    encoders = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        # " V....D libx264  libx264 H.264 ..." の形式の行だけを見る
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in 'VAS' and parts[1] != '=':
+            encoders.add(parts[1])
+    return frozenset(encoders)
+
+
+@lru_cache(maxsize=None)
+def encoder_works(encoder):
+    # 一覧に載っていてもGPUがないと失敗するので、小さな映像を実際にエンコードしてみる
+    if encoder not in available_encoders():
+        return False
+    probe_cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'color=c=black:s=256x256:r=24:d=0.2',
+        '-frames:v', '3', '-c:v:0', encoder, '-f', 'null', '-',
+    ]
+    try:
+        return subprocess.run(probe_cmd, capture_output=True).returncode == 0
+    except OSError:
+        return False
+
+
+def is_available(profile_name):
+    return profile_name in PROFILES and encoder_works(PROFILES[profile_name]['encoder'])
+
+
+def select_profile(preferred=None):
+    # preferred が使えればそれを、使えなければ FALLBACK_ORDER の順で最初に使えるものを返す
+    if preferred is not None and preferred not in PROFILES:
+        raise ValueError(f"不明なエンコードプロファイルです: {preferred} (選択肢: {', '.join(PROFILES)})")
+    if preferred is not None and is_available(preferred):
+        return preferred
+    for profile_name in FALLBACK_ORDER:
+        if is_available(profile_name):
+            if preferred is not None:
+                print(f"エンコードプロファイル {preferred} は使えないため {profile_name} を使用します。")
+            return profile_name
+    raise RuntimeError("使用できる動画エンコーダが見つかりません。FFmpegのインストールを確認してください。")
+
+
+def output_args(profile_name):
+    return list(PROFILES[profile_name]['output_args'])
@@ -0,0 +1,41 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+
+class IntervalIndex:
+    """閉区間 [start, end] の集合から、時刻 t に有効な区間を二分探索で引けるようにしたもの
+
+    区間の端点で時間軸を分割し、各端点ちょうどの時刻と、端点の間の時刻それぞれで
+    有効な区間の番号（元の並び順）を前もって求めておく。
+    """
+
+    def __init__(self, intervals):
+        # intervals: (start, end) のリスト。結果は元のリストでの番号で返す
+        starts_at = defaultdict(list)
+        ends_at = defaultdict(list)
+        for index, (start, end) in enumerate(intervals):
+            starts_at[start].append(index)
+            ends_at[end].append(index)
+        self.points = sorted(set(starts_at) | set(ends_at))
+        self.at_point = []
+        self.after_point = []
+        active = set()
+        for point in self.points:
+            active.update(starts_at.get(point, ()))
+            self.at_point.append(tuple(sorted(active)))
+            active.difference_update(ends_at.get(point, ()))
+            self.after_point.append(tuple(sorted(active)))
+
+    def active(self, t):
+        # t に有効な区間の番号を元の並び順で返す
+        i = bisect_right(self.points, t) - 1
+        if i < 0:
+            return ()
+        if self.points[i] == t:
+            return self.at_point[i]
+        return self.after_point[i]
+
+    def first(self, t):
+        # t に有効な区間のうち、元の並び順で最初のもの（なければ None）
+        active = self.active(t)
+        return active[0] if active else None
@@ -1,111 +1,88 @@
 import pysrt
-import requests
-import tempfile
-import os
-from testengtokana2 import EnglishToKana, replace_english_to_kana
+from tts_cache import prepare_tts_text
+from tts_client import TTSClient
 from pydub import AudioSegment
-import numpy as np
+from audio_effects import CLOSING_ECHO, apply_echo
+from se_bank import SEBank
+from audio_mix import AudioMixer, DuckingEnvelope, common_format, segment_to_array
 import random
 
-def text_to_speech(subs, config):
+def text_to_speech(subs, config, client=None):
     import random  # ランダムモジュールをインポート
-    API_URL = "http://127.0.0.1:5000/voice"
-    audio_files = []
-    e2k = EnglishToKana()  # カタカナ変換のためのインスタンスを作成
+    if client is None:
+        # make_srt.py が生成した音声をキャッシュから再利用する（使い終わったら接続を閉じる）
+        with TTSClient() as client:
+            return text_to_speech(subs, config, client)
     model_ids = list(range(1))  # 0から4までのリストを作成
     random.shuffle(model_ids)  # リストをシャッフルしてランダムな順序にする
 
+    items = []
     for sub in subs:
-        original_text = sub.text.replace("AI", "エーアイ")  # AIをエーアイに変換
-        # 英語をカタカナに変換するために修正された関数を使用
-        kana_text = replace_english_to_kana(original_text, e2k)
+        # AIをエーアイに、英語をカタカナに変換（make_srt.py と共通）
+        kana_text = prepare_tts_text(sub.text)
         params = config["voice_api"].copy()
-        params['text'] = kana_text  # 変換後のテキストを使用
         if not model_ids:  # model_idsが空になったら再度シャッフルしてリセット
             model_ids = list(range(1))
             random.shuffle(model_ids)
         params['model_id'] = model_ids.pop(0)  # リストの先頭からmodel_idを取得し、その要素をリストから削除
+        items.append((kana_text, params))
 
-        response = requests.get(API_URL, params=params)
-        if response.status_code == 200:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                tmp_file.write(response.content)
-                audio_files.append((tmp_file.name, sub.start.ordinal, sub.end.ordinal))
+    # 全ての字幕をまとめて並列に音声化（結果は字幕の順番のまま）
+    audio_files = []
+    counts = {'hits': 0, 'misses': 0}  # このステージの分だけ数える
+    for sub, (wav_path, status_code) in zip(subs, client.synthesize_many(items, counts)):
+        if wav_path:
+            audio_files.append((wav_path, sub.start.ordinal, sub.end.ordinal))
         else:
-            print(f"Failed to generate speech for subtitle index {sub.index}: HTTP {response.status_code}")
+            print(f"Failed to generate speech for subtitle index {sub.index}: HTTP {status_code}")
+    client.cache.report("make_audio", counts)
     return audio_files
 
-def integrate_audio(audio_files):
+def integrate_audio(audio_files, output_path="output.wav"):
     # 最後の音声ファイルの終了時間に10秒の余韻を加える
     if audio_files:
         video_duration_in_milliseconds = max(end for _, _, end in audio_files) + 10000  # 10秒をミリ秒に変換して加算
     else:
         video_duration_in_milliseconds = 10000  # 音声ファイルがない場合は10秒の余韻のみ
 
-    combined = AudioSegment.silent(duration=video_duration_in_milliseconds)  # ミリ秒単位
+    # 音声ファイルはTTSキャッシュなので削除しない
+    clips = [(AudioSegment.from_file(file_path), start) for file_path, start, end in audio_files]
 
-    for file_path, start, end in audio_files:
-        audio = AudioSegment.from_file(file_path)
-        combined = combined.overlay(audio, position=start)
-
-        os.remove(file_path)  # 一時ファイルを削除
+    # 無音(AudioSegment.silentと同じ11025Hz/モノラル)に重ねた場合と同じフォーマットに揃える
+    frame_rate, channels = common_format((audio for audio, _ in clips), frame_rate=11025, channels=1)
+    mixer = AudioMixer(video_duration_in_milliseconds, frame_rate, channels)
+    for audio, start in clips:
+        mixer.add_segment(audio, position_ms=start)
 
     # BGMは無音化しないため、ここでは何も変更しない
-    combined.export("output.wav", format="wav")
-
-
-def apply_reverb_effect(sound, decay_factors, delay_ms):
-
-    samples = np.array(sound.get_array_of_samples())
-    sample_rate = sound.frame_rate
-    mixed_samples = samples.astype(np.float64)
-
-    for decay, delay in zip(decay_factors, delay_ms):
-        delay_samples = int(delay * sample_rate / 1000)
-        delayed_samples = np.zeros_like(mixed_samples)
-        delayed_samples[delay_samples:] = mixed_samples[:-delay_samples] * decay
-        mixed_samples += delayed_samples
+    mixer.export(output_path, format="wav")
 
-    # クリッピングを防ぐために正規化
-    max_val = np.max(np.abs(mixed_samples))
-    if max_val > 0:
-        mixed_samples = np.clip(mixed_samples / max_val, -1.0, 1.0)
 
-    # np.int16の範囲に合わせてスケーリング
-    mixed_samples = mixed_samples * 32767  # np.int16の最大値
-    mixed_sound = sound._spawn(mixed_samples.astype(np.int16).tobytes())
-    return mixed_sound
+def combined_audio(audio_files, duck_db=None, echo_settings=CLOSING_ECHO, narration_path="output.wav", bgm_path="BGM.wav", output_path="final_output_with_bgm.wav"):
+    output_audio = AudioSegment.from_file(narration_path)
+    bgm_audio = AudioSegment.from_file(bgm_path)
 
-def combined_audio(audio_files):
-    output_audio = AudioSegment.from_file("output.wav")
-    bgm_audio = AudioSegment.from_file("BGM.wav")
-    bgm_audio = bgm_audio - 12
-
-    bgm_duration = len(bgm_audio)
-    output_duration = len(output_audio)
-    looped_bgm = bgm_audio
-    while len(looped_bgm) < output_duration:
-        looped_bgm += bgm_audio
-    looped_bgm = looped_bgm[:output_duration]
-
-    final_audio = output_audio.overlay(looped_bgm)
+    frame_rate, channels = common_format([output_audio, bgm_audio])
+    mixer = AudioMixer.from_segment(output_audio, frame_rate, channels)
 
     if audio_files:
-        last_subtitle_start_time = audio_files[-1][1]
-        reverb_part = output_audio[last_subtitle_start_time:]
-        reverb_part = reverb_part.overlay(reverb_part, position=100, gain_during_overlay=-6)
+        # 最後の字幕から後ろにエコーをかける（チャンネルごとに1つのFIRとして適用）
+        last_subtitle_start = mixer.ms_to_frames(audio_files[-1][1])
+        mixer.buffer[last_subtitle_start:] = apply_echo(mixer.buffer[last_subtitle_start:], frame_rate, echo_settings)
 
-        # apply_delay_effectの代わりにapply_reverb_effectを使用
-        reverb_part_with_reverb = apply_reverb_effect(reverb_part, decay_factors=[0.3, 0.2, 0.15], delay_ms=[45, 75, 105])
+    # ナレーションに合わせてBGMを下げる場合は、BGMを足す前のナレーションからゲインを求める
+    envelope = DuckingEnvelope(mixer.buffer, frame_rate, duck_db=duck_db) if duck_db else None
 
-        final_narration_with_reverb = output_audio[:last_subtitle_start_time] + reverb_part_with_reverb
-        final_audio_with_reverb = final_narration_with_reverb.overlay(looped_bgm)
-    else:
-        final_audio_with_reverb = final_audio
+    # BGMを-12dBにしてナレーションの長さまでループさせる（連結せずにタイムラインへ直接敷く）
+    bgm = segment_to_array(bgm_audio, frame_rate, channels)
+    mixer.add_looped(bgm, gain_db=-12, envelope=envelope)
 
-    final_audio_with_reverb.export("final_output_with_bgm.wav", format="wav")
+    mixer.export(output_path, format="wav")
+
+def insert_se_at_timestamps(se_file_path, audio_file_path, se_folder_path, se_bank=None, output_path="output_with_se.wav"):
+    if se_bank is None:
+        se_bank = SEBank(se_folder_path)  # SEフォルダは一度だけ調べ、デコード済みのSEを使い回す
 
-def insert_se_at_timestamps(se_file_path, audio_file_path, se_folder_path):
     # SE.txtを読み込む
     with open(se_file_path, 'r', encoding='utf-8') as file:
         se_lines = file.readlines()
@@ -113,6 +90,7 @@ def insert_se_at_timestamps(se_file_path, audio_file_path, se_folder_path):
     # 元のオーディオファイルを読み込む
     main_audio = AudioSegment.from_file(audio_file_path)
 
+    se_clips = []
     for line in se_lines:
         timestamp, se_type = line.strip().split(' ')
         # タイムスタンプからミリ秒を取り除く
@@ -121,22 +99,20 @@ def insert_se_at_timestamps(se_file_path, audio_file_path, se_folder_path):
         milliseconds = (hours * 3600 + minutes * 60 + seconds) * 1000
 
         # SEファイルをランダムに選択
-        se_files = [f for f in os.listdir(os.path.join(se_folder_path, se_type)) if f.endswith('.mp3')]
-        se_file = random.choice(se_files)
-        se_audio = AudioSegment.from_file(os.path.join(se_folder_path, se_type, se_file))
-
-        # SEの音量を50%に調整
-        se_audio = se_audio - 10  # 音量を約半分に下げる
+        se_clips.append((se_bank.choose(se_type), milliseconds))
 
-        # SEを指定されたタイムスタンプに挿入
-        main_audio = main_audio.overlay(se_audio, position=milliseconds)
+    # 全てのSEを1本のタイムラインに足し込む（SEの音量は約半分(-10dB)に調整済み）
+    frame_rate, channels = se_bank.common_format({path for path, _ in se_clips}, *common_format([main_audio]))
+    mixer = AudioMixer.from_segment(main_audio, frame_rate, channels)
+    for se_path, milliseconds in se_clips:
+        mixer.add(se_bank.clip(se_path, frame_rate, channels), position_ms=milliseconds)
 
     # 結果をファイルにエクスポート
-    main_audio.export("output_with_se.wav", format="wav")
+    mixer.export(output_path, format="wav")
 
-def main():
-    # SRTファイルのパスをoutput.srtに設定
-    srt_file_path = "output.srt"
+def main(duck_db=None, srt_file_path="output.srt", se_file_path="SE.txt", bgm_path="BGM.wav", se_folder_path="SE",
+         narration_path="output.wav", bgm_mix_path="final_output_with_bgm.wav", output_path="output_with_se.wav", client=None, se_bank=None):
+    # client/se_bank を渡すと、同じプロセス内の他のステージ・ジョブと接続やデコード済みのSEを共有する
 
     # SRTファイルから字幕を読み込む
     subs = pysrt.open(srt_file_path)
@@ -161,16 +137,32 @@ def main():
     }
 
     # 字幕を音声に変換
-    audio_files = text_to_speech(subs, config)
+    if client is None:
+        with TTSClient() as client:
+            audio_files = text_to_speech(subs, config, client)
+    else:
+        audio_files = text_to_speech(subs, config, client)
 
     # 音声ファイルを統合し、動画の全長を設定
-    integrate_audio(audio_files)
+    integrate_audio(audio_files, narration_path)
 
     # BGMを合成し、最後の字幕にエコーをかける
-    combined_audio(audio_files)
+    combined_audio(audio_files, duck_db=duck_db, narration_path=narration_path, bgm_path=bgm_path, output_path=bgm_mix_path)
 
     # SEを挿入し、最終的な音声ファイルを出力
-    insert_se_at_timestamps('SE.txt', 'final_output_with_bgm.wav', 'SE')
+    insert_se_at_timestamps(se_file_path, bgm_mix_path, se_folder_path, se_bank, output_path)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--duck-db', type=float, default=None, help='ナレーション中にBGMを下げる量(dB, 例: -8)。省略時はダッキングしない')
+    arg_parser.add_argument('--srt', default='output.srt', help='字幕ファイルのパス')
+    arg_parser.add_argument('--se-list', default='SE.txt', help='SEの一覧のパス')
+    arg_parser.add_argument('--bgm', default='BGM.wav', help='BGMのパス')
+    arg_parser.add_argument('--se-folder', default='SE', help='SEのフォルダ')
+    arg_parser.add_argument('--narration', default='output.wav', help='出力するナレーションのみの音声')
+    arg_parser.add_argument('--bgm-mix', default='final_output_with_bgm.wav', help='出力するBGM入りの音声')
+    arg_parser.add_argument('--output', default='output_with_se.wav', help='出力する最終的な音声')
+    args = arg_parser.parse_args()
+    main(duck_db=args.duck_db, srt_file_path=args.srt, se_file_path=args.se_list, bgm_path=args.bgm, se_folder_path=args.se_folder,
+         narration_path=args.narration, bgm_mix_path=args.bgm_mix, output_path=args.output)
\ No newline at end of file
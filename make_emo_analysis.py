@@ -1,35 +1,174 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, LukeConfig
-import torch
-import pysrt
+import time
+_import_started = time.perf_counter()
+
+import argparse
 import datetime
+import hashlib
+import os
+import threading
+import pysrt
+from emo_cache import EmotionCache
+import perf_trace
+
+MODEL_ID = 'Mizuiro-sakura/luke-japanese-large-sentiment-analysis-wrime'
+EMOTIONS = ['joy', 'sadness', 'anticipation', 'surprise', 'anger', 'fear', 'disgust', 'trust']
+
+_default_classifier = None
+_default_classifier_lock = threading.Lock()
+
+def resolve_model_path(model_id=MODEL_ID, download=False):
+    # EMO_MODEL_PATH が指定されていればそのディレクトリをそのまま使う
+    model_path = os.environ.get('EMO_MODEL_PATH')
+    if model_path:
+        return model_path
+    from huggingface_hub import snapshot_download
+    if download:
+        # 明示的に指定されたときだけHubからダウンロードする
+        return snapshot_download(model_id)
+    from huggingface_hub.utils import LocalEntryNotFoundError
+    try:
+        # ダウンロード済みのスナップショットを探すだけで、Hubには問い合わせない
+        return snapshot_download(model_id, local_files_only=True)
+    except LocalEntryNotFoundError:
+        raise RuntimeError(
+            f"感情分析のモデル {model_id} が見つかりません。環境変数 EMO_MODEL_PATH にモデルのディレクトリを指定するか、"
+            "python make_emo_analysis.py --download-model で先にダウンロードしてください。") from None
+
+def model_cache_id(model_path=None):
+    """感情キャッシュのキーに使うモデルの識別子（モデルは読み込まず、場所と config.json の内容から作る）"""
+    model_path = os.path.abspath(model_path or resolve_model_path())
+    digest = hashlib.sha256()
+    config_path = os.path.join(model_path, 'config.json')
+    if os.path.exists(config_path):
+        with open(config_path, 'rb') as config_file:
+            digest.update(config_file.read())
+    return f"{model_path}:{digest.hexdigest()[:16]}"
+
+class EmotionClassifier:
+    """LUKEの感情分類モデルを保持し、字幕テキストをまとめて分類する"""
 
-# モデルとトークナイザーの準備
-tokenizer = AutoTokenizer.from_pretrained("Mizuiro-sakura/luke-japanese-large-sentiment-analysis-wrime")
-config = LukeConfig.from_pretrained('Mizuiro-sakura/luke-japanese-large-sentiment-analysis-wrime', output_hidden_states=True)    
-model = AutoModelForSequenceClassification.from_pretrained('Mizuiro-sakura/luke-japanese-large-sentiment-analysis-wrime', config=config)
+    def __init__(self, model_path=None, model_id=MODEL_ID):
+        # torch/transformersは重いので、モデルを使うときに初めてインポートする
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        self.torch = torch
+        self.model_id = model_id
+        self.model_path = model_path or resolve_model_path(model_id)
+        self.cache_id = model_cache_id(self.model_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
+        self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path, local_files_only=True)
+        self.model.eval()
+        self._lock = threading.Lock()
 
-def analyze_emotion(text):
-    max_seq_length = 512
-    token = tokenizer(text, truncation=True, max_length=max_seq_length, padding="max_length")
-    output = model(torch.tensor(token['input_ids']).unsqueeze(0), torch.tensor(token['attention_mask']).unsqueeze(0))
-    max_index = torch.argmax(torch.tensor(output.logits))
-    emotions = ['joy', 'sadness', 'anticipation', 'surprise', 'anger', 'fear', 'disgust', 'trust']
-    return emotions[max_index]
+    def classify(self, texts, batch_size=16):
+        return [label for label, _ in self.classify_with_logits(texts, batch_size=batch_size)]
+
+    def classify_with_logits(self, texts, batch_size=16):
+        torch = self.torch
+        max_seq_length = 512
+        results = [None] * len(texts)
+        if not texts:
+            return results
+        # 先にトークン化して長さの近いもの同士でバッチを組み、パディングはバッチ内の最大長までにする
+        encodings = self.tokenizer(list(texts), truncation=True, max_length=max_seq_length)
+        order = sorted(range(len(texts)), key=lambda i: len(encodings['input_ids'][i]))
+        with self._lock, torch.inference_mode():
+            for batch_start in range(0, len(order), batch_size):
+                batch_indices = order[batch_start:batch_start + batch_size]
+                with perf_trace.span('emotion_batch', 'emotion', size=len(batch_indices)):
+                    token = self.tokenizer.pad({
+                        'input_ids': [encodings['input_ids'][i] for i in batch_indices],
+                        'attention_mask': [encodings['attention_mask'][i] for i in batch_indices],
+                    }, return_tensors='pt')
+                    # 分類には最終出力しか使わないので、隠れ状態は返さない
+                    output = self.model(token['input_ids'], token['attention_mask'], output_hidden_states=False)
+                    logits = output.logits.float()
+                    max_indices = torch.argmax(logits, dim=-1).tolist()
+                for i, max_index, row in zip(batch_indices, max_indices, logits.tolist()):
+                    results[i] = (EMOTIONS[max_index], row)
+        return results
+
+def get_classifier():
+    # 同じプロセス内では一度読み込んだモデルを使い回す
+    global _default_classifier
+    with _default_classifier_lock:
+        if _default_classifier is None:
+            with perf_trace.span('load_model', 'emotion'):
+                _default_classifier = EmotionClassifier()
+        return _default_classifier
+
+def analyze_emotions(texts, batch_size=16, classifier=None):
+    if classifier is None:
+        classifier = get_classifier()
+    return classifier.classify(texts, batch_size=batch_size)
+
+def analyze_emotion(text, classifier=None):
+    return analyze_emotions([text], classifier=classifier)[0]
 
 def convert_timestamp(ts):
     return datetime.timedelta(hours=ts.hour, minutes=ts.minute, seconds=ts.second, microseconds=ts.microsecond)
 
-def process_srt_pysrt(file_path):
+def classify_with_cache(texts, classifier=None, cache=None):
+    # キャッシュにないテキストだけをモデルにかける（同じテキストは一度だけ）
+    unique_texts = list(dict.fromkeys(texts))
+    found = cache.get_many(unique_texts) if cache is not None else {}
+    missing = [text for text in unique_texts if text not in found]
+    if missing:
+        if classifier is None:
+            classifier = get_classifier()  # 全てキャッシュにあればモデルは読み込まない
+        computed = dict(zip(missing, classifier.classify_with_logits(missing)))
+        if cache is not None:
+            cache.put_many(computed)
+        found.update(computed)
+    return [found[text][0] for text in texts]
+
+def process_srt_pysrt(file_path, emo_file_path='EMO_pysrt.txt', classifier=None, use_cache=True):
     subtitles = pysrt.open(file_path, encoding='utf-8')
-    with open('EMO_pysrt.txt', 'w', encoding='utf-8') as emo_file:
-        for index, subtitle in enumerate(subtitles):
-            if index == 0:  # 最初の字幕をスキップ
-                continue
-            emotion = analyze_emotion(subtitle.text)
-            start_ts = subtitle.start.to_time()  # pysrtではdatetime.timeオブジェクトが返される
-            end_ts = subtitle.end.to_time()
-            emo_file.write(f"{start_ts} --> {end_ts}: {emotion}\n")
-
-# SRTファイルのパス
-srt_file_path = 'output.srt'
-process_srt_pysrt(srt_file_path)
+    subtitles = subtitles[1:]  # 最初の字幕をスキップ
+    emotions = []
+    if subtitles:
+        # 実際に使うモデルで結果を引く（EMO_MODEL_PATH で別のモデルを指したときに古い結果を返さない）
+        cache_id = classifier.cache_id if classifier is not None else model_cache_id()
+        cache = EmotionCache(cache_id) if use_cache else None
+        emotions = classify_with_cache([subtitle.text for subtitle in subtitles], classifier, cache)
+        if cache is not None:
+            cache.report("make_emo_analysis")
+            cache.close()
+    lines = []
+    for subtitle, emotion in zip(subtitles, emotions):
+        start_ts = subtitle.start.to_time()  # pysrtではdatetime.timeオブジェクトが返される
+        end_ts = subtitle.end.to_time()
+        lines.append(f"{start_ts} --> {end_ts}: {emotion}\n")
+    with open(emo_file_path, 'w', encoding='utf-8') as emo_file:
+        emo_file.writelines(lines)
+
+def measure_startup(sample_texts=("草", "それな", "これは流石にワロタ")):
+    # モジュールの読み込み、モデルの読み込み、最初の推論にかかる時間をそれぞれ計測する
+    timings = {'import': time.perf_counter() - _import_started}
+    started = time.perf_counter()
+    classifier = get_classifier()
+    timings['load_model'] = time.perf_counter() - started
+    started = time.perf_counter()
+    classifier.classify(list(sample_texts))
+    timings['first_inference'] = time.perf_counter() - started
+    started = time.perf_counter()
+    classifier.classify(list(sample_texts))
+    timings['warm_inference'] = time.perf_counter() - started
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds:.3f}s")
+    return timings
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--srt', default='output.srt')  # SRTファイルのパス
+    arg_parser.add_argument('--output', default='EMO_pysrt.txt')
+    arg_parser.add_argument('--no-cache', action='store_true', help='感情キャッシュを使わない')
+    arg_parser.add_argument('--startup-time', action='store_true', help='起動時間を計測して表示する')
+    arg_parser.add_argument('--download-model', action='store_true', help='モデルが手元になければHubからダウンロードする')
+    args = arg_parser.parse_args()
+    if args.download_model:
+        print(f"モデルの場所: {resolve_model_path(download=True)}")
+    if args.startup_time:
+        measure_startup()
+    else:
+        process_srt_pysrt(args.srt, args.output, use_cache=not args.no_cache)
@@ -1,29 +1,20 @@
 import cv2
-from PIL import ImageFont, ImageDraw, Image, ImageChops
+from PIL import ImageDraw, Image
 import pysrt
-import budoux
 import subprocess
 import os
 import random
 from pathlib import Path
-import atexit
 import tempfile
-
-def wrap_text(text, max_width, font, draw, font_size):
-    parser = budoux.load_default_japanese_parser()
-    phrases = parser.parse(text)
-    wrapped_text = ""
-    current_line = ""
-    for phrase in phrases:
-        test_line = current_line + phrase if current_line else phrase
-        text_length = draw.textlength(test_line, font=font)
-        if text_length > max_width and current_line:
-            wrapped_text += current_line + '\n'
-            current_line = phrase
-        else:
-            current_line = test_line
-    wrapped_text += current_line
-    return wrapped_text
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from bg_source import BackgroundSource
+from interval_index import IntervalIndex
+from text_layout import FONT_PATH, get_font, layout_text
+from emo_assets import DEFAULT_EMO_DIR, get_avatar, list_emotion_images, preload_avatars
+from static_layers import HEADER_DECORATIONS, load_static_layer
+from encoder_profiles import PROFILES, output_args, select_profile
+import perf_trace
 
 def load_emotion_data(emo_file_path):
     emotion_data = []
@@ -39,36 +30,12 @@ def timestamp_to_seconds(timestamp):
     hours, minutes, seconds = map(int, timestamp.split(':'))
     return hours * 3600 + minutes * 60 + seconds
 
-def cleanup_temp_file(path):
-    path.unlink(missing_ok=True)
-
-def preprocess_image(image_path):
-    image = Image.open(image_path).convert("RGBA")
-    image = image.resize((300, 300), Image.Resampling.LANCZOS)
-    mask = Image.new('L', (300, 300), 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0, 300, 300), fill=255)
-    alpha = image.split()[3]
-    alpha = ImageChops.multiply(alpha, mask)
-    image.putalpha(alpha)
-    background = Image.new('RGBA', (300, 300), (255, 255, 255, 255))
-    background.putalpha(mask)
-    background.paste(image, (0, 0), alpha)
-    background = background.transpose(Image.FLIP_LEFT_RIGHT)
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.temp.png')
-    background.save(temp_file.name)
-    temp_path = Path(temp_file.name)
-    temp_file.close()
-    atexit.register(cleanup_temp_file, temp_path)
-    return temp_path
-
-def map_emotions_to_images(emotion_data):
+def map_emotions_to_images(emotion_data, emo_dir=DEFAULT_EMO_DIR):
     emotion_image_map = {}
     used_images = {}
     for timestamps, emotion in emotion_data:
         key = f"{timestamps[0]}-{timestamps[1]}-{emotion}"
-        emo_images_path = Path('emoimages') / emotion
-        images = list(emo_images_path.glob('*.png'))
+        images = list_emotion_images(emotion, emo_dir)
         if emotion not in used_images:
             used_images[emotion] = []
         available_images = [img for img in images if img not in used_images[emotion]]
@@ -77,140 +44,336 @@ def map_emotions_to_images(emotion_data):
         if available_images:
             image_path = random.choice(available_images)
             used_images[emotion].append(image_path)
-            processed_image_path = preprocess_image(image_path)
-            emotion_image_map[key] = processed_image_path
+            emotion_image_map[key] = str(image_path)
+    # 使う画像だけを加工済みキャッシュから先に読み込んでおく
+    preload_avatars(set(emotion_image_map.values()))
     return emotion_image_map
 
-def overlay_emotion_image(img_pil, image_path, video_size):
-    try:
-        emo_image = Image.open(image_path).convert("RGBA")
-        emo_image = emo_image.resize((250, 250))
-        img_w, _ = emo_image.size
-        bg_w, _ = video_size
-        offset = (bg_w - img_w - 10, 10)
-        img_pil.paste(emo_image, offset, emo_image)
-    except Exception as e:
-        print(f"画像のオーバーレイ中にエラーが発生しました: {e}")
-    return img_pil
-
-def create_video_from_srt(srt_path, output_path, audio_path, video_size=(1280, 720), bg_video_path='background.mp4'):
-    subs = pysrt.open(srt_path)
-    fps = 24
-    font_path = r"C:\Users\yuto9\Desktop\test-program1\auto_nanj_matome\GenEiNuGothic-EB_v1.1\GenEiNuGothic-EB.ttf"
-    font_size = 96
-    font = ImageFont.truetype(font_path, font_size)
-    bg_cap = cv2.VideoCapture(bg_video_path)
-    bg_frame_count = int(bg_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    bg_fps = bg_cap.get(cv2.CAP_PROP_FPS)
-    frame_duration = 1.0 / bg_fps
+def render_overlay_layer(texts, emotion_image_path, video_size, font, font_size):
+    """感情画像・字幕ウィンドウ・字幕テキストを1枚のRGBAレイヤーにまとめて描画し、(レイヤー, 貼り付け位置) を返す"""
+    layer = Image.new('RGBA', video_size, (0, 0, 0, 0))
 
-    last_subtitle_end_time = subs[-1].end.ordinal / 1000.0 if subs else 0
+    if emotion_image_path:
+        try:
+            # 円形・反転・縮小済みの画像をメモリ上のキャッシュから取り出す
+            emo_image = get_avatar(emotion_image_path)
+            img_w, _ = emo_image.size
+            bg_w, _ = video_size
+            layer.alpha_composite(emo_image, dest=(bg_w - img_w - 10, 10))
+        except Exception as e:
+            print(f"画像のオーバーレイ中にエラーが発生しました: {e}")
+
+    for text in texts:
+        # 透明な白の上にテキストを描いておくと、合成したときに文字の縁が黒ずまない
+        text_layer = Image.new('RGBA', video_size, (255, 255, 255, 0))
+        draw = ImageDraw.Draw(text_layer)
+        # 折り返しと各行の幅は (テキスト, フォント, 幅) ごとにキャッシュされる
+        text_lines, line_widths = layout_text(text, font, video_size[0] - 40)
+        wrapped_text = '\n'.join(text_lines)
+        text_width = max(line_widths)
+        text_height = font_size * len(text_lines)
+        x = (video_size[0] - text_width) / 2
+        y = (video_size[1] - text_height) / 2
+
+        padding = 10
+
+        # 半透明のウィンドウ（画面からはみ出す部分は切り捨てる）
+        window_x0 = max(int(x - padding), 0)
+        window_y0 = max(int(y - padding), 0)
+        window_x1 = min(int(x - padding) + int(text_width + padding * 2), video_size[0])
+        window_y1 = min(int(y - padding) + int(text_height + padding * 2), video_size[1])
+        if window_x1 > window_x0 and window_y1 > window_y0:
+            window_image = Image.new('RGBA', (window_x1 - window_x0, window_y1 - window_y0), (0, 0, 0, 128))
+            layer.alpha_composite(window_image, dest=(window_x0, window_y0))
+
+        draw.text((x, y), wrapped_text, font=font, fill=(255, 255, 255))
+        layer.alpha_composite(text_layer)
+
+    bbox = layer.getbbox()
+    if bbox is None:
+        return None
+    return layer.crop(bbox), bbox[:2]
+
+def frame_times(duration, fps):
+    # 出力する各フレームの時刻（0秒から duration 秒まで 1/fps 刻み）
     current_time = 0
-    video_duration_with_extra_time = last_subtitle_end_time + 10
+    while current_time <= duration:
+        yield current_time
+        current_time += 1/fps
 
-    emotion_data = load_emotion_data('EMO_pysrt.txt')
-    emotion_image_map = map_emotions_to_images(emotion_data)
-
-    # 一時ディレクトリを作成してフレームを保存
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_dir_path = Path(temp_dir)
-        frame_number = 0
-
-        while current_time <= video_duration_with_extra_time:
-            bg_cap.set(cv2.CAP_PROP_POS_FRAMES, int((current_time / frame_duration) % bg_frame_count))
-            ret, bg_frame = bg_cap.read()
-            if not ret:
-                break
-
-            img_pil = Image.fromarray(cv2.cvtColor(bg_frame, cv2.COLOR_BGR2RGB)).convert("RGBA")
-            draw = ImageDraw.Draw(img_pil, "RGBA")
-
-            constant_text = "AIなんJ民の反応集"
-            constant_font_size = 52
-            constant_font = ImageFont.truetype(font_path, constant_font_size)
-            shadow_offset = [(1,1), (-1,-1), (1,-1), (-1,1)]
-            for offset in shadow_offset:
-                draw.text((10 + offset[0], 10 + offset[1]), constant_text, font=constant_font, fill=(0, 0, 0))
-            draw.text((10, 10), constant_text, font=constant_font, fill=(255, 255, 255))
-
-            current_emotion = None
-            for timestamps, emotion in emotion_data:
-                start_time = timestamp_to_seconds(timestamps[0])
-                end_time = timestamp_to_seconds(timestamps[1])
-                if start_time <= current_time <= end_time:
-                    current_emotion = emotion
-                    break
-
-            if current_emotion:
-                key = f"{timestamps[0]}-{timestamps[1]}-{current_emotion}"
-                image_path = emotion_image_map.get(key)
-                if image_path:
-                    img_pil = overlay_emotion_image(img_pil, image_path, video_size)
-
-            for sub in subs:
-                if sub.start.ordinal / 1000 <= current_time <= sub.end.ordinal / 1000:
-                    wrapped_text = wrap_text(sub.text, video_size[0] - 40, font, draw, font_size)
-                    text_lines = wrapped_text.split('\n')
-                    text_width = max(draw.textlength(line, font=font) for line in text_lines)
-                    text_height = font_size * len(text_lines)
-                    x = (video_size[0] - text_width) / 2
-                    y = (video_size[1] - text_height) / 2
-
-                    padding = 10
-
-                    window_x = int(x - padding)
-                    window_y = int(y - padding)
-                    window_width = int(text_width + padding * 2)
-                    window_height = int(text_height + padding * 2)
-
-                    window_image = Image.new('RGBA', (window_width, window_height), (0, 0, 0, 128))
-                    bg_section = img_pil.crop((window_x, window_y, window_x + window_width, window_y + window_height))
-                    blended_section = Image.alpha_composite(bg_section, window_image)
-                    img_pil.paste(blended_section, (window_x, window_y), blended_section)
-
-                    draw = ImageDraw.Draw(img_pil)
-                    draw.text((x, y), wrapped_text, font=font, fill=(255, 255, 255))
-
-            frame_path = temp_dir_path / f"frame_{frame_number:05d}.png"
-            img_pil.save(frame_path)
-            frame_number += 1
-            current_time += 1/fps
-
-        bg_cap.release()
-
-        # FFmpegを使用してNVENCで動画をエンコード
+def mux_args(first_input_index, audio_path=None, thumbnail_path=None, video_args=("-c:v", "copy")):
+    # 映像(入力0)に音声とサムネイルを加えて1回で書き出すための FFmpeg 引数 (入力側, 出力側) を返す
+    input_args = []
+    output_args = ["-map", "0:v:0"]
+    input_index = first_input_index
+    if audio_path:
+        input_args += ["-i", audio_path]
+        output_args += ["-map", f"{input_index}:a:0"]
+        input_index += 1
+    if thumbnail_path:
+        input_args += ["-i", thumbnail_path]
+        output_args += ["-map", f"{input_index}:v:0"]
+    output_args += list(video_args)
+    if audio_path:
+        output_args += ["-c:a", "aac"]
+    if thumbnail_path:
+        # サムネイルはカバーアートとしてそのまま格納する
+        output_args += ["-c:v:1", "copy", "-disposition:v:1", "attached_pic"]
+    return input_args, output_args
+
+class PipeFrameWriter:
+    """フレームをRGB24の生データのままFFmpegの標準入力に流し込んでエンコードする"""
+
+    def __init__(self, output_path, video_size, fps, encoder_profile='nvenc', audio_path=None, thumbnail_path=None):
+        # 音声とサムネイルが指定されていれば、エンコードと同時に多重化する
+        mux_input_args, mux_output_args = mux_args(1, audio_path, thumbnail_path, output_args(encoder_profile))
         ffmpeg_cmd = [
             "ffmpeg",
-            "-hwaccel", "cuda",
-            "-r", str(fps),
-            "-f", "image2",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
             "-s", f"{video_size[0]}x{video_size[1]}",
-            "-i", str(temp_dir_path / "frame_%05d.png"),
-            "-c:v", "h264_nvenc",
-            "-pix_fmt", "yuv420p",
+            "-r", str(fps),
+            "-i", "-",
+        ] + mux_input_args + mux_output_args + [
             "-y",  # 同名ファイルが存在する場合は上書きする
             output_path
         ]
-        subprocess.run(ffmpeg_cmd, check=True)
+        self.process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE)
+        self.output_path = output_path
+        self.closed = False
+
+    def write(self, img_pil):
+        try:
+            self.process.stdin.write(img_pil.convert("RGB").tobytes())
+        except BrokenPipeError:
+            # FFmpegが先に終了した場合は close() で終了コードを確認する
+            self.close()
+
+    def close(self, aborted=False):
+        # aborted のときは途中までのフレームをエンコードさせずにFFmpegを止める
+        if self.closed:
+            return
+        self.closed = True
+        if aborted:
+            self.process.kill()
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.process.wait()
+        if aborted:
+            # 途中で止めた不完全な動画は残さない
+            if os.path.exists(self.output_path):
+                os.remove(self.output_path)
+            return
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.process.args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 描画中の例外は FFmpeg のエラーで隠さず、そのまま呼び出し元に伝える
+        self.close(aborted=exc_type is not None)
+        return False
+
+class PngFrameWriter:
+    """フレームをPNGとして一時ディレクトリに保存し、最後にまとめてエンコードする（従来の方式）"""
+
+    def __init__(self, output_path, video_size, fps, encoder_profile='nvenc', audio_path=None, thumbnail_path=None):
+        self.encoder_profile = encoder_profile
+        self.audio_path = audio_path
+        self.thumbnail_path = thumbnail_path
+        self.output_path = output_path
+        self.video_size = video_size
+        self.fps = fps
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_dir_path = Path(self.temp_dir.name)
+        self.frame_number = 0
+
+    def write(self, img_pil):
+        frame_path = self.temp_dir_path / f"frame_{self.frame_number:05d}.png"
+        img_pil.save(frame_path)
+        self.frame_number += 1
+
+    def close(self, aborted=False):
+        # aborted のときは途中までのフレームをエンコードせず、一時ディレクトリを消すだけにする
+        if aborted:
+            self.temp_dir.cleanup()
+            return
+        try:
+            # FFmpegを使用して選択したエンコーダで動画をエンコード（音声とサムネイルも同時に多重化）
+            mux_input_args, mux_output_args = mux_args(1, self.audio_path, self.thumbnail_path, output_args(self.encoder_profile))
+            ffmpeg_cmd = [
+                "ffmpeg",
+                "-r", str(self.fps),
+                "-f", "image2",
+                "-s", f"{self.video_size[0]}x{self.video_size[1]}",
+                "-i", str(self.temp_dir_path / "frame_%05d.png"),
+            ] + mux_input_args + mux_output_args + [
+                "-y",  # 同名ファイルが存在する場合は上書きする
+                self.output_path
+            ]
+            subprocess.run(ffmpeg_cmd, check=True)
+        finally:
+            self.temp_dir.cleanup()
 
-    # エンコードされた動画にオーディオをマージ
-    final_output_path = 'output_with_audio.mp4'
-    if os.path.exists(final_output_path):
-        os.remove(final_output_path)
-    ffmpeg_merge_cmd = [
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(aborted=exc_type is not None)
+        return False
+
+def render_frames(times, writer, subs, emotion_data, emotion_image_map, video_size, bg_video_path, font_path):
+    # times の各時刻のフレームを描画して writer に書き出す
+    font_size = 96
+    font = get_font(font_path, font_size)
+
+    header_layer = load_static_layer(HEADER_DECORATIONS, video_size, font_path)
+
+    # 背景動画は別スレッドで先頭から順番にデコードして先読みしておく
+    bg_source = BackgroundSource(bg_video_path, iter(times))
+
+    overlay_cache = {}
+    # 毎フレーム全件を走査しないよう、字幕と感情の区間を前もって索引化しておく
+    sub_intervals = IntervalIndex([(sub.start.ordinal / 1000, sub.end.ordinal / 1000) for sub in subs])
+    emotion_intervals = IntervalIndex([(timestamp_to_seconds(timestamps[0]), timestamp_to_seconds(timestamps[1])) for timestamps, _ in emotion_data])
+    try:
+        # 計測が有効なときは、背景待ち・字幕の描画・合成・エンコードに分けてフレームごとの時間を記録する
+        for current_time, bg_frame in perf_trace.timed_iter(bg_source, 'bg_wait', 'frame'):
+            with perf_trace.span('text', 'frame'):
+                # 感情はファイルの並び順で最初に一致したもの、字幕は有効なもの全てを使う
+                image_path = None
+                emotion_index = emotion_intervals.first(current_time)
+                if emotion_index is not None:
+                    timestamps, current_emotion = emotion_data[emotion_index]
+                    key = f"{timestamps[0]}-{timestamps[1]}-{current_emotion}"
+                    image_path = emotion_image_map.get(key)
+
+                active_subs = sub_intervals.active(current_time)
+
+                # 字幕と感情画像の組み合わせが変わったときだけレイヤーを描き直す
+                overlay_key = (active_subs, image_path)
+                if overlay_key not in overlay_cache:
+                    overlay_cache.clear()  # 同じ組み合わせに戻ることはほぼないので直前の1つだけ保持する
+                    overlay_cache[overlay_key] = render_overlay_layer([subs[index].text for index in active_subs], image_path, video_size, font, font_size)
+                overlay = overlay_cache[overlay_key]
+
+            with perf_trace.span('composite', 'frame'):
+                img_pil = Image.fromarray(cv2.cvtColor(bg_frame, cv2.COLOR_BGR2RGB)).convert("RGBA")
+
+                # 固定のヘッダーは描画済みのレイヤーを重ねるだけ
+                if header_layer:
+                    img_pil.alpha_composite(header_layer[0], dest=header_layer[1])
+
+                if overlay:
+                    layer, position = overlay
+                    img_pil.alpha_composite(layer, dest=position)
+
+            with perf_trace.span('encode', 'frame'):
+                writer.write(img_pil)
+    finally:
+        bg_source.close()
+
+def split_into_chunks(times, subs, n_chunks):
+    # フレームをなるべく均等に n_chunks 個へ分ける。区切りは字幕の始まるフレームに合わせる
+    boundaries = sorted(set(bisect_left(times, sub.start.ordinal / 1000) for sub in subs) - {0, len(times)})
+    cuts = []
+    for k in range(1, n_chunks):
+        target = len(times) * k // n_chunks
+        candidates = boundaries or [target]
+        cut = min(candidates, key=lambda boundary: abs(boundary - target))
+        if 0 < cut < len(times) and (not cuts or cut > cuts[-1]):
+            cuts.append(cut)
+    edges = [0] + cuts + [len(times)]
+    return list(zip(edges[:-1], edges[1:]))
+
+def render_chunk(job):
+    # ワーカープロセスで1区間分のフレームを描画し、個別の動画ファイルにエンコードする
+    subs = pysrt.open(job['srt_path'])
+    try:
+        with PipeFrameWriter(job['chunk_path'], job['video_size'], job['fps'], job['encoder_profile']) as writer:
+            render_frames(job['times'], writer, subs, job['emotion_data'], job['emotion_image_map'], job['video_size'], job['bg_video_path'], job['font_path'])
+    finally:
+        # ワーカープロセスで測った分は親プロセスでまとめる
+        perf_trace.flush()
+    return job['chunk_path']
+
+def concat_videos(video_paths, output_path, work_dir, audio_path=None, thumbnail_path=None):
+    # concat demuxer で再エンコードせずにつなぎ、同時に音声とサムネイルを多重化する
+    mux_input_args, mux_output_args = mux_args(1, audio_path, thumbnail_path)
+    list_path = os.path.join(work_dir, 'concat.txt')
+    with open(list_path, 'w', encoding='utf-8') as list_file:
+        for video_path in video_paths:
+            escaped_path = Path(video_path).resolve().as_posix().replace("'", "'\\''")
+            list_file.write(f"file '{escaped_path}'\n")
+    ffmpeg_concat_cmd = [
         "ffmpeg",
-        "-i", output_path,
-        "-i", audio_path,
-        "-c:v", "copy",
-        "-c:a", "aac",
-        "-strict", "experimental",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+    ] + mux_input_args + mux_output_args + [
         "-y",  # 同名ファイルが存在する場合は上書きする
-        final_output_path
+        output_path
     ]
-    subprocess.run(ffmpeg_merge_cmd, check=True)
+    subprocess.run(ffmpeg_concat_cmd, check=True)
+
+def create_video_from_srt(srt_path, output_path, audio_path, video_size=(1280, 720), bg_video_path='background.mp4', stream_frames=True, workers=1, encoder=None, thumbnail_path=None, font_path=FONT_PATH, emo_file_path='EMO_pysrt.txt', emo_dir=DEFAULT_EMO_DIR):
+    # 映像のエンコード・音声の多重化・サムネイルの埋め込みを1回の書き出しで行い、output_path に最終出力を作る
+    subs = pysrt.open(srt_path)
+    # 使えるエンコーダを調べ、指定されたものが使えなければ自動で切り替える
+    encoder_profile = select_profile(encoder)
+    fps = 24
+
+    last_subtitle_end_time = subs[-1].end.ordinal / 1000.0 if subs else 0
+    video_duration_with_extra_time = last_subtitle_end_time + 10
+    times = list(frame_times(video_duration_with_extra_time, fps))
+
+    emotion_data = load_emotion_data(emo_file_path)
+    emotion_image_map = map_emotions_to_images(emotion_data, emo_dir)
+    # ヘッダーのレイヤーは並列ワーカーを起動する前にディスクキャッシュへ用意しておく
+    load_static_layer(HEADER_DECORATIONS, video_size, font_path)
+
+    if workers > 1:
+        # 時間軸を区間に分け、区間ごとに別プロセスで描画・エンコードしてからつなぐ
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jobs = []
+            for index, (start, end) in enumerate(split_into_chunks(times, subs, workers)):
+                jobs.append({
+                    'srt_path': srt_path,
+                    'chunk_path': os.path.join(temp_dir, f"chunk_{index:03d}.mp4"),
+                    'times': times[start:end],
+                    'emotion_data': emotion_data,
+                    'emotion_image_map': emotion_image_map,
+                    'video_size': video_size,
+                    'fps': fps,
+                    'bg_video_path': bg_video_path,
+                    'font_path': font_path,
+                    'encoder_profile': encoder_profile,
+                })
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunk_paths = list(pool.map(render_chunk, jobs))
+            concat_videos(chunk_paths, output_path, temp_dir, audio_path, thumbnail_path)
+    else:
+        # ストリーミング時はFFmpegのパイプへ、そうでなければ一時ディレクトリのPNGへフレームを書き出す
+        writer_class = PipeFrameWriter if stream_frames else PngFrameWriter
+        with writer_class(output_path, video_size, fps, encoder_profile, audio_path, thumbnail_path) as writer:
+            render_frames(times, writer, subs, emotion_data, emotion_image_map, video_size, bg_video_path, font_path)
 
 if __name__ == "__main__":
-    srt_path = 'output.srt'
-    output_path = 'video_from_srt.mp4'
-    audio_path = 'output_with_se.wav'
-    create_video_from_srt(srt_path, output_path, audio_path, bg_video_path='background.mp4')
\ No newline at end of file
+    import argparse
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--workers', type=int, default=1, help='並列に描画するプロセス数')
+    arg_parser.add_argument('--encoder', choices=sorted(PROFILES), default=None, help='エンコードプロファイル（省略時は自動選択）')
+    arg_parser.add_argument('--output', default='output_with_audio.mp4', help='最終出力の動画ファイル')
+    arg_parser.add_argument('--thumbnail', default=None, help='カバーアートとして埋め込むサムネイル画像')
+    arg_parser.add_argument('--srt', default='output.srt', help='字幕ファイルのパス')
+    arg_parser.add_argument('--audio', default='output_with_se.wav', help='多重化する音声')
+    arg_parser.add_argument('--emo', default='EMO_pysrt.txt', help='感情分析の結果のパス')
+    arg_parser.add_argument('--background', default='background.mp4', help='背景動画')
+    arg_parser.add_argument('--font', default=FONT_PATH, help='フォントファイル')
+    arg_parser.add_argument('--emoimages', default=DEFAULT_EMO_DIR, help='感情ごとの画像を入れたディレクトリ')
+    args = arg_parser.parse_args()
+    create_video_from_srt(args.srt, args.output, args.audio, bg_video_path=args.background, workers=args.workers, encoder=args.encoder, thumbnail_path=args.thumbnail, font_path=args.font, emo_file_path=args.emo, emo_dir=args.emoimages)
@@ -1,7 +1,6 @@
-import requests
 import soundfile as sf
-import tempfile
-import os
+from tts_cache import prepare_tts_text
+from tts_client import TTSClient
 
 # 音声APIの設定
 config = {
@@ -22,7 +21,6 @@ config = {
     }
 }
 
-
 def format_time(seconds):
     hours, remainder = divmod(seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -40,88 +38,90 @@ def parse_comments(lines):
             comments[-1] += " " + line.strip().split('< ')[-1]
     return title, comments
 
-def text_to_speech_duration(text, config):
-    API_URL = "http://127.0.0.1:5000/voice"
-    params = config["voice_api"].copy()
-    params['text'] = text
-    response = requests.get(API_URL, params=params)
-    if response.status_code == 200:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-            tmp_file.write(response.content)
-            tmp_file.flush()
-            # ここで一時ファイルを閉じる
-        # soundfileを使用して音声ファイルの長さを取得
-        data, samplerate = sf.read(tmp_file.name)
-        duration_seconds = len(data) / samplerate
-        # ファイル使用後に削除
-        os.unlink(tmp_file.name)
-        return duration_seconds
-    else:
-        print(f"Failed to generate speech: HTTP {response.status_code}")
-        return 0
+def text_to_speech_durations(texts, config, client=None, counts=None):
+    if client is None:
+        with TTSClient() as client:
+            return text_to_speech_durations(texts, config, client, counts)
+    # make_audio.py と同じ読み上げテキストにしておくと、ここで生成した音声をそのまま再利用できる
+    items = [(prepare_tts_text(text), config["voice_api"]) for text in texts]
+    durations = []
+    for wav_path, status_code in client.synthesize_many(items, counts):
+        if wav_path:
+            # soundfileを使用して音声ファイルの長さを取得（ファイルはキャッシュとして残す）
+            info = sf.info(wav_path)
+            durations.append(info.frames / info.samplerate)
+        else:
+            print(f"Failed to generate speech: HTTP {status_code}")
+            durations.append(0)
+    return durations
+
+def text_to_speech_duration(text, config, client=None):
+    return text_to_speech_durations([text], config, client)[0]
     
-def generate_srt_content(title, comments, config):
+def generate_srt_content(title, comments, config, se_file_path='SE.txt', client=None, counts=None):
     srt_content = []
     current_time = 1  # 2秒後から字幕開始
     srt_index = 1
 
     # SEファイルを新規作成または置き換え
-    open('SE.txt', 'w').close()
-
-    # スレッドタイトルを出力
-    title_duration = text_to_speech_duration(title, config) + 1  # TTSの長さに1秒を追加
-    start_time = format_time(current_time)
-    end_time = format_time(current_time + title_duration)
-    srt_content.append(f"{srt_index}\n{start_time} --> {end_time}\n{title}\n\n")
-    write_se_file('title', start_time)  # SEファイルにタイトルの開始時間を記録
-    srt_index += 1
-    current_time += title_duration
+    open(se_file_path, 'w').close()
 
+    # スレッドタイトル、本文コメント、返信コメントの順に並べる
+    entries = [('title', title)]
     for comment in comments:
         lines = comment.split(">>")
-        main_comment = lines[0].strip()
-        
-        # 本文コメントを出力
-        comment_duration = text_to_speech_duration(main_comment, config) + 1  # TTSの長さに1秒を追加
+        entries.append(('comment', lines[0].strip()))
+        for reply in lines[1:]:
+            entries.append(('reply', reply.strip()))
+
+    # 全ての行の音声をまとめて並列に生成し、長さを取得
+    durations = text_to_speech_durations([text for _, text in entries], config, client, counts)
+
+    for (se_type, text), duration in zip(entries, durations):
+        text_duration = duration + 1  # TTSの長さに1秒を追加
         start_time = format_time(current_time)
-        end_time = format_time(current_time + comment_duration)
-        srt_content.append(f"{srt_index}\n{start_time} --> {end_time}\n{main_comment}\n\n")
-        write_se_file('comment', start_time)  # SEファイルにコメントの開始時間を記録
+        end_time = format_time(current_time + text_duration)
+        srt_content.append(f"{srt_index}\n{start_time} --> {end_time}\n{text}\n\n")
+        write_se_file(se_type, start_time, se_file_path)  # SEファイルに開始時間と種類を記録
         srt_index += 1
-        current_time += comment_duration
-        
-        # 返信コメントを出力
-        for reply in lines[1:]:
-            reply_duration = text_to_speech_duration(reply.strip(), config) + 1  # TTSの長さに1秒を追加
-            start_time = format_time(current_time)
-            end_time = format_time(current_time + reply_duration)
-            srt_content.append(f"{srt_index}\n{start_time} --> {end_time}\n{reply.strip()}\n\n")
-            write_se_file('reply', start_time)  # SEファイルに返信の開始時間を記録
-            srt_index += 1
-            current_time += reply_duration
+        current_time += text_duration
 
     return srt_content
 
-def parse_and_generate_srt(input_file_path):
+def parse_and_generate_srt(input_file_path, se_file_path='SE.txt', client=None, counts=None):
     with open(input_file_path, 'r', encoding='utf-8') as file:
         lines = file.readlines()
 
     title, comments = parse_comments(lines)
     # ここでconfig変数をgenerate_srt_content関数に渡します
-    srt_content = generate_srt_content(title, comments, config)
+    srt_content = generate_srt_content(title, comments, config, se_file_path, client, counts)
     return srt_content
 
 def save_srt_file(srt_content, output_file_path):
     with open(output_file_path, 'w', encoding='utf-8') as file:
         file.writelines(srt_content)
 
-def write_se_file(se_type, start_time):
-    with open('SE.txt', 'a', encoding='utf-8') as file:
+def write_se_file(se_type, start_time, se_file_path='SE.txt'):
+    with open(se_file_path, 'a', encoding='utf-8') as file:
         file.write(f"{start_time} {se_type}\n")
 
-if __name__ == "__main__":
-    input_file_path = 'input.txt'  # 入力ファイルのパス
-    output_file_path = 'output.srt'  # 出力ファイルのパス
-    srt_content = parse_and_generate_srt(input_file_path)
+def make_srt(input_file_path='input.txt', output_file_path='output.srt', se_file_path='SE.txt', client=None):
+    """input.txt から字幕(SRT)とSEの一覧を作る"""
+    if client is None:
+        # 呼び出し側がクライアントを渡さなければ、ここで作って使い終わったら閉じる
+        with TTSClient() as client:
+            return make_srt(input_file_path, output_file_path, se_file_path, client)
+    counts = {'hits': 0, 'misses': 0}  # 他のステージやジョブとクライアントを共有していても、この呼び出しの分だけ数える
+    srt_content = parse_and_generate_srt(input_file_path, se_file_path, client, counts)
     save_srt_file(srt_content, output_file_path)
-    print("SRTファイルが生成されました。")
\ No newline at end of file
+    client.cache.report("make_srt", counts)
+    print("SRTファイルが生成されました。")
+
+if __name__ == "__main__":
+    import argparse
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--input', default='input.txt', help='入力ファイルのパス')
+    arg_parser.add_argument('--output', default='output.srt', help='出力するSRTファイルのパス')
+    arg_parser.add_argument('--se', default='SE.txt', help='出力するSEの一覧のパス')
+    args = arg_parser.parse_args()
+    make_srt(args.input, args.output, args.se)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+# サブプロセスで実行するステージにも計測を有効にさせるための環境変数（値は出力先のパス）
+ENV_VAR = 'NANJ_TRACE'
+
+_lock = threading.Lock()
+_events = []
+_durations = {}
+_thread_names = {}
+_path = None
+_owner_pid = None
+_part_count = 0
+# perf_counter の値をプロセス間で揃えられる時刻（UNIX時間）に直すための差分
+_EPOCH = time.time() - time.perf_counter()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        complete(self.name, self.start, time.perf_counter(), self.cat, **self.args)
+        return False
+
+
+def enable(path):
+    """計測を有効にし、save() で path に Chrome trace 形式(JSON)で書き出す"""
+    global _path, _owner_pid
+    _path = path
+    _owner_pid = os.getpid()
+    os.environ[ENV_VAR] = path
+    # 前回の実行で残った部分ファイルは混ぜない
+    for part_path in glob.glob(glob.escape(path) + '.*.part'):
+        os.remove(part_path)
+
+
+def enabled():
+    return _path is not None
+
+
+def span(name, cat='', **args):
+    # 無効なときは何もしない共通のオブジェクトを返すだけにして、呼び出し側の負担をなくす
+    if _path is None:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def complete(name, start, end, cat='', **args):
+    """perf_counter で測った start から end までを1つの区間として記録する"""
+    if _path is None:
+        return
+    thread = threading.current_thread()
+    event = {
+        'name': name,
+        'cat': cat,
+        'ph': 'X',
+        'ts': (_EPOCH + start) * 1e6,
+        'dur': (end - start) * 1e6,
+        'pid': os.getpid(),
+        'tid': thread.ident,
+    }
+    if args:
+        event['args'] = args
+    with _lock:
+        _events.append(event)
+        _durations.setdefault((cat, name), []).append(end - start)
+        _thread_names.setdefault(thread.ident, thread.name)
+
+
+def timed_iter(iterable, name, cat=''):
+    # 次の要素が得られるまで待った時間を要素ごとに記録する（無効なときは元のイテラブルをそのまま返す）
+    if _path is None:
+        return iterable
+    return _timed_iter(iterable, name, cat)
+
+
+def _timed_iter(iterable, name, cat):
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        complete(name, started, time.perf_counter(), cat)
+        yield item
+
+
+def percentile(sorted_values, q):
+    # 最近傍順位法
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summary():
+    """(カテゴリ, 名前) ごとの件数・合計・パーセンタイル（秒）"""
+    result = {}
+    with _lock:
+        items = [(key, sorted(values)) for key, values in _durations.items()]
+    for (cat, name), values in sorted(items):
+        result[f"{cat}/{name}" if cat else name] = {
+            'count': len(values),
+            'total': sum(values),
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'p99': percentile(values, 99),
+            'max': values[-1],
+        }
+    return result
+
+
+def _trace_events():
+    with _lock:
+        events = list(_events)
+        thread_names = dict(_thread_names)
+    pid = os.getpid()
+    metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}} for tid, name in thread_names.items()]
+    return metadata + events
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as trace_file:
+        json.dump(data, trace_file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def flush():
+    # 計測を有効にしたプロセス以外（サブプロセスのステージや描画ワーカー）は、部分ファイルに書き出して親にまとめてもらう
+    global _part_count
+    if _path is None or os.getpid() == _owner_pid:
+        return
+    pid = os.getpid()
+    # fork した子プロセスは親の記録も引き継いでいるので、このプロセスで記録したものだけを書き出す
+    events = [event for event in _trace_events() if event['pid'] == pid]
+    with _lock:
+        _events.clear()
+        _durations.clear()
+        _part_count += 1
+        part_path = f"{_path}.{pid}-{_part_count}.part"
+    if any(event['ph'] == 'X' for event in events):
+        _write_json(part_path, {'traceEvents': events})
+
+
+def save():
+    """記録した区間を書き出し、集計を表示する"""
+    if _path is None:
+        return
+    if os.getpid() != _owner_pid:
+        flush()
+        return
+    events = _trace_events()
+    for part_path in sorted(glob.glob(glob.escape(_path) + '.*.part')):
+        with open(part_path, 'r', encoding='utf-8') as part_file:
+            part_events = json.load(part_file)['traceEvents']
+        os.remove(part_path)
+        events.extend(part_events)
+        # 他のプロセスで測った区間も集計に含める
+        with _lock:
+            for event in part_events:
+                if event['ph'] == 'X':
+                    _durations.setdefault((event['cat'], event['name']), []).append(event['dur'] / 1e6)
+    stats = summary()
+    _write_json(_path, {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'summary': stats}})
+    print_summary(stats)
+    print(f"計測結果を書き出しました: {_path}")
+
+
+def print_summary(stats):
+    print("区間                              件数      合計      p50      p90      p99      最大")
+    for key, s in stats.items():
+        print(f"{key:<32} {s['count']:6d} {s['total']:8.2f}s {s['p50'] * 1000:7.1f}ms {s['p90'] * 1000:7.1f}ms {s['p99'] * 1000:7.1f}ms {s['max'] * 1000:7.1f}ms")
+
+
+# 親プロセスが環境変数で計測を有効にしていれば、このプロセスの分も終了時に書き出す
+if os.environ.get(ENV_VAR):
+    _path = os.environ[ENV_VAR]
+    atexit.register(flush)
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import perf_trace
+
+
+class Stage:
+    """パイプラインの1段。inputs/outputs はファイルかディレクトリのパス
+
+    params にはファイル以外で結果を左右するもの（使うモデルなど）を文字列で返す関数を渡せる。
+    """
+
+    def __init__(self, name, run, inputs, outputs, deps=(), params=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.params = params
+
+
+class Pipeline:
+    """ステージの依存関係(DAG)に沿って実行し、入力の内容が前回の成功時と同じステージは飛ばす"""
+
+    def __init__(self, stages, state_path=os.path.join('cache', 'pipeline_state.json'), name=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        # 複数のパイプラインを同時に動かすときにログを見分けるための名前
+        self.name = name
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"ステージ {stage.name} の依存先 {dep} がありません")
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        state.setdefault('stages', {})
+        state.setdefault('files', {})
+        return state
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.json', dir=os.path.dirname(self.state_path) or '.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+            json.dump(self.state, tmp_file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def order(self):
+        # 依存先が先に来るように並べる（トポロジカルソート）
+        ordered = []
+        visiting = set()
+        visited = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"ステージの依存関係が循環しています: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+    def hash_file(self, path):
+        # サイズと更新時刻が前回と同じなら、前回計算したハッシュを使う（大きな動画を毎回読まないため）
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.state['files'].get(path)
+        if cached and cached[:2] == signature:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        self.state['files'][path] = signature + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash_path(self, path):
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    file_path = os.path.join(root, filename)
+                    digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                    digest.update(self.hash_file(file_path).encode('ascii'))
+            return 'dir:' + digest.hexdigest()
+        if os.path.isfile(path):
+            return self.hash_file(path)
+        return 'missing'
+
+    def input_key(self, stage):
+        digest = hashlib.sha256()
+        for path in stage.inputs:
+            digest.update(path.encode('utf-8'))
+            digest.update(self.hash_path(path).encode('utf-8'))
+        if stage.params is not None:
+            digest.update(stage.params().encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_up_to_date(self, stage, key):
+        # 入力のハッシュが前回成功したときと同じで、出力も全て残っていれば実行不要
+        return self.state['stages'].get(stage.name) == key and all(os.path.exists(path) for path in stage.outputs)
+
+    def label(self, stage_name):
+        return f"{self.name}/{stage_name}" if self.name else stage_name
+
+    def _run_stage(self, stage, started):
+        # 実行を待っている間に他のステージが失敗していたら始めない（実行したかどうかを返す）
+        if self._failed.is_set():
+            return False
+        print(f"[{self.label(stage.name)}] 実行します")
+        # 開始・終了時刻はワーカーの中で測る（空きワーカーを待っていた時間を所要時間に含めない）
+        stage_started = time.perf_counter() - started
+        try:
+            with perf_trace.span(self.label(stage.name), cat='stage'):
+                stage.run()
+        except BaseException:
+            self._failed.set()
+            raise
+        finally:
+            self._stage_times[stage.name] = (stage_started, time.perf_counter() - started)
+        return True
+
+    def run(self, force=(), max_workers=1):
+        """依存関係を満たしたステージから順に、最大 max_workers 個まで同時に実行する"""
+        force = set(force)
+        unknown = force - set(self.stages) - {'all'}
+        if unknown:
+            raise ValueError(f"不明なステージです: {', '.join(sorted(unknown))} (選択肢: {', '.join(self.stages)})")
+        order = self.order()
+        self.timings = {}
+        self._stage_times = {}
+        self._failed = threading.Event()
+        started = time.perf_counter()
+        pending = list(order)
+        done = set()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='stage') as pool:
+            while pending or running:
+                # 失敗したら新しいステージは始めず、実行中のものが終わるのを待つ
+                ready = [] if error else [name for name in pending if all(dep in done for dep in self.stages[name].deps)]
+                for name in ready:
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    # ハッシュと状態の更新はこのスレッドだけで行う
+                    key = self.input_key(stage)
+                    if 'all' not in force and name not in force and self.is_up_to_date(stage, key):
+                        print(f"[{self.label(name)}] 入力に変更がないためスキップします")
+                        now = time.perf_counter() - started
+                        self.timings[name] = (now, now, 'スキップ')
+                        done.add(name)
+                        continue
+                    running[pool.submit(self._run_stage, stage, started)] = (name, key)
+                if not running:
+                    if error or not ready:
+                        break
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, key = running.pop(future)
+                    if future.exception() is not None:
+                        self.timings[name] = self._stage_times[name] + ('失敗',)
+                        error = error or future.exception()
+                        continue
+                    if not future.result():
+                        # 先に失敗したステージがあったため実行しなかった（表では未実行になる）
+                        continue
+                    self.timings[name] = self._stage_times[name] + ('実行',)
+                    # 実行後に入力のハッシュを記録する（実行中に入力が書き換わった場合も次回に再実行される）
+                    self.state['stages'][name] = key
+                    self._save_state()
+                    done.add(name)
+        self.report()
+        if error is not None:
+            raise error
+
+    def critical_path(self):
+        # 各ステージの所要時間で重み付けした、依存関係上いちばん長い経路
+        longest = {}
+        previous = {}
+        for name in self.order():
+            deps = [dep for dep in self.stages[name].deps if dep in longest]
+            before = max(deps, key=lambda dep: longest[dep], default=None)
+            start, end, _ = self.timings.get(name, (0, 0, None))
+            longest[name] = (longest[before] if before else 0) + (end - start)
+            previous[name] = before
+        if not longest:
+            return [], 0.0
+        name = max(longest, key=longest.get)
+        total = longest[name]
+        path = []
+        while name:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def report(self):
+        if not self.timings:
+            return
+        # 他のパイプラインの出力と混ざらないよう、表はまとめて1回で出力する
+        lines = [f"== {self.name} ==" if self.name else None, "ステージ        開始     終了     所要時間  状態"]
+        for name in self.order():
+            if name not in self.timings:
+                lines.append(f"{name:<14} {'-':>7}  {'-':>7}  {'-':>8}  未実行")
+                continue
+            start, end, status = self.timings[name]
+            lines.append(f"{name:<14} {start:7.1f}s {end:7.1f}s {end - start:8.1f}s  {status}")
+        path, total = self.critical_path()
+        elapsed = max(end for _, end, _ in self.timings.values())
+        lines.append(f"クリティカルパス: {' -> '.join(path)} ({total:.1f}s) / 全体 {elapsed:.1f}s")
+        print('\n'.join(line for line in lines if line is not None))
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import random
+import tempfile
+import threading
+
+import numpy as np
+from pydub import AudioSegment
+
+from audio_mix import db_to_gain, segment_to_array
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'se')
+
+
+class SEBank:
+    """SE/<種類>/ の効果音を一度だけ調べてデコードし、音量調整済みのPCMをメモリに持っておく
+
+    デコード結果はファイル内容のハッシュをキーに .npz として保存するので、次回以降はMP3をデコードしない。
+    """
+
+    def __init__(self, se_folder='SE', cache_dir=DEFAULT_CACHE_DIR, gain_db=-10):
+        self.se_folder = se_folder
+        self.cache_dir = cache_dir
+        self.gain_db = gain_db
+        self.files = {}
+        self._native = {}
+        self._clips = {}
+        self._lock = threading.Lock()
+        if os.path.isdir(se_folder):
+            for se_type in sorted(os.listdir(se_folder)):
+                type_dir = os.path.join(se_folder, se_type)
+                if os.path.isdir(type_dir):
+                    self.files[se_type] = [os.path.join(type_dir, f) for f in os.listdir(type_dir) if f.endswith('.mp3')]
+
+    def choose(self, se_type):
+        # 種類ごとにランダムに1つ選ぶ
+        if not self.files.get(se_type):
+            raise FileNotFoundError(f"SEが見つかりません: {os.path.join(self.se_folder, se_type)}")
+        return random.choice(self.files[se_type])
+
+    def native(self, path):
+        """デコード済みの (int16の(フレーム数, チャンネル数)配列, サンプリングレート) を返す"""
+        with self._lock:
+            if path in self._native:
+                return self._native[path]
+        with open(path, 'rb') as se_file:
+            digest = hashlib.sha256(se_file.read()).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{digest}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                result = (cached['samples'], int(cached['frame_rate']))
+        else:
+            segment = AudioSegment.from_file(path)
+            result = (segment_to_array(segment, segment.frame_rate, segment.channels), segment.frame_rate)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.savez(tmp_file, samples=result[0], frame_rate=result[1])
+            os.replace(tmp_path, cache_path)
+        with self._lock:
+            self._native[path] = result
+        return result
+
+    def common_format(self, paths, frame_rate=0, channels=0):
+        # 使うSEとメインの音声のうち、最も高いレート・多いチャンネル数
+        for path in paths:
+            samples, native_rate = self.native(path)
+            frame_rate = max(frame_rate, native_rate)
+            channels = max(channels, samples.shape[1])
+        return frame_rate, channels
+
+    def clip(self, path, frame_rate, channels):
+        """指定したフォーマットに変換して音量を調整した float32 の (フレーム数, チャンネル数) 配列を返す"""
+        key = (path, frame_rate, channels)
+        with self._lock:
+            if key in self._clips:
+                return self._clips[key]
+        samples, native_rate = self.native(path)
+        if native_rate != frame_rate or samples.shape[1] != channels:
+            segment = AudioSegment(samples.tobytes(), frame_rate=native_rate, sample_width=2, channels=samples.shape[1])
+            samples = segment_to_array(segment, frame_rate, channels)
+        clip = samples.astype(np.float32) * np.float32(db_to_gain(self.gain_db))
+        with self._lock:
+            self._clips[key] = clip
+        return clip
@@ -0,0 +1,136 @@
+import os
+import subprocess
+import sys
+import threading
+
+from text_layout import FONT_PATH
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def job_paths(video_name, workdir='.', assets_dir='.', font_path=FONT_PATH):
+    """1本の動画を作るときに各ステージが読み書きするパス
+
+    workdir には入力・中間ファイル・最終出力を、assets_dir には共有の素材（BGM・SE・背景など）を置く。
+    """
+    def work(name):
+        return os.path.normpath(os.path.join(workdir, name))
+
+    def asset(name):
+        return os.path.normpath(os.path.join(assets_dir, name))
+
+    return {
+        'input': work('input.txt'),
+        'srt': work('output.srt'),
+        'se_list': work('SE.txt'),
+        'emo': work('EMO_pysrt.txt'),
+        'narration': work('output.wav'),
+        'bgm_mix': work('final_output_with_bgm.wav'),
+        'audio': work('output_with_se.wav'),
+        'thumbnail': work('youtube_thumbnail.png'),
+        'video': work(video_name),
+        'bgm': asset('BGM.wav'),
+        'se_folder': asset('SE'),
+        'thumbnail_background': asset('thumbnail_background'),
+        'watermark': asset('nanj.png'),
+        'background': asset('background.mp4'),
+        'emoimages': asset('emoimages'),
+        'font': font_path,
+    }
+
+
+class InProcessRunner:
+    """各ステージを同じプロセス内の関数として呼ぶ
+
+    モジュールは最初に使うステージで一度だけ読み込まれ、フォント・感情分析のモデル・TTSクライアント・
+    デコード済みのSEはステージ（とジョブ）をまたいで使い回される。
+    """
+
+    def __init__(self):
+        self._se_banks = {}
+        self._tts_client = None
+        self._lock = threading.Lock()
+
+    def tts_client(self):
+        # make_srt.py と make_audio.py で同じ接続プールと音声キャッシュを使う（最初に使うときに作る）
+        from tts_client import TTSClient
+        with self._lock:
+            if self._tts_client is None:
+                self._tts_client = TTSClient()
+            return self._tts_client
+
+    def se_bank(self, se_folder):
+        from se_bank import SEBank
+        with self._lock:
+            if se_folder not in self._se_banks:
+                self._se_banks[se_folder] = SEBank(se_folder)
+            return self._se_banks[se_folder]
+
+    def srt(self, paths):
+        import make_srt
+        make_srt.make_srt(paths['input'], paths['srt'], paths['se_list'], self.tts_client())
+
+    def emo_model(self):
+        # 感情分析に使うモデルの識別子（モデルは読み込まない）
+        import make_emo_analysis
+        return make_emo_analysis.model_cache_id()
+
+    def emo(self, paths):
+        import make_emo_analysis
+        # モデルは make_emo_analysis.get_classifier() が一度だけ読み込む
+        make_emo_analysis.process_srt_pysrt(paths['srt'], paths['emo'])
+
+    def audio(self, paths):
+        import make_audio
+        make_audio.main(srt_file_path=paths['srt'], se_file_path=paths['se_list'], bgm_path=paths['bgm'],
+                        se_folder_path=paths['se_folder'], narration_path=paths['narration'], bgm_mix_path=paths['bgm_mix'],
+                        output_path=paths['audio'], client=self.tts_client(), se_bank=self.se_bank(paths['se_folder']))
+
+    def thumbnail(self, paths):
+        import make_thumbnail
+        make_thumbnail.make_thumbnail(paths['input'], paths['thumbnail'], paths['thumbnail_background'], paths['watermark'], paths['font'])
+
+    def movie(self, paths):
+        import make_movie_text
+        make_movie_text.create_video_from_srt(paths['srt'], paths['video'], paths['audio'], bg_video_path=paths['background'],
+                                              thumbnail_path=paths['thumbnail'], font_path=paths['font'], emo_file_path=paths['emo'],
+                                              emo_dir=paths['emoimages'])
+
+    def close(self):
+        if self._tts_client is not None:
+            self._tts_client.close()
+
+
+class SubprocessRunner:
+    """各ステージを別の Python プロセスで実行する（ステージ同士を完全に分離したいとき用）"""
+
+    def _run(self, script, *args):
+        subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, script), *args], check=True)
+
+    def srt(self, paths):
+        self._run('make_srt.py', '--input', paths['input'], '--output', paths['srt'], '--se', paths['se_list'])
+
+    def emo_model(self):
+        # 子プロセスも同じ環境変数でモデルを探すので、ここで調べたものと同じになる
+        import make_emo_analysis
+        return make_emo_analysis.model_cache_id()
+
+    def emo(self, paths):
+        self._run('make_emo_analysis.py', '--srt', paths['srt'], '--output', paths['emo'])
+
+    def audio(self, paths):
+        self._run('make_audio.py', '--srt', paths['srt'], '--se-list', paths['se_list'], '--bgm', paths['bgm'],
+                  '--se-folder', paths['se_folder'], '--narration', paths['narration'], '--bgm-mix', paths['bgm_mix'],
+                  '--output', paths['audio'])
+
+    def thumbnail(self, paths):
+        self._run('make_thumbnail.py', '--input', paths['input'], '--output', paths['thumbnail'],
+                  '--background-dir', paths['thumbnail_background'], '--watermark', paths['watermark'], '--font', paths['font'])
+
+    def movie(self, paths):
+        self._run('make_movie_text.py', '--srt', paths['srt'], '--audio', paths['audio'], '--emo', paths['emo'],
+                  '--background', paths['background'], '--output', paths['video'], '--thumbnail', paths['thumbnail'], '--font', paths['font'],
+                  '--emoimages', paths['emoimages'])
+
+    def close(self):
+        pass
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from PIL import Image, ImageDraw
+
+from text_layout import get_font
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'static_layers')
+
+# 全フレームに固定で表示する装飾。上から順に重ねて描画する
+# 透かしやロゴを追加する場合は {'type': 'image', 'path': 'logo.png', 'position': (x, y), 'opacity': 0.5} のように書く
+HEADER_DECORATIONS = [
+    {
+        'type': 'text',
+        'text': "AIなんJ民の反応集",
+        'font_size': 52,
+        'position': (10, 10),
+        'fill': (255, 255, 255),
+        'shadow_fill': (0, 0, 0),
+        'shadow_offsets': [(1, 1), (-1, -1), (1, -1), (-1, 1)],
+    },
+]
+
+_memory_cache = {}
+
+
+def _composite_text(layer, position, text, font, fill):
+    # 文字色と同じ色の透明なレイヤーに描いてから重ねると、縁の色が背景に正しく混ざる
+    text_layer = Image.new('RGBA', layer.size, tuple(fill) + (0,))
+    ImageDraw.Draw(text_layer).text(position, text, font=font, fill=tuple(fill))
+    layer.alpha_composite(text_layer)
+
+
+def rasterize_decorations(decorations, video_size, font_path):
+    layer = Image.new('RGBA', video_size, (0, 0, 0, 0))
+    for decoration in decorations:
+        x, y = decoration['position']
+        if decoration['type'] == 'text':
+            font = get_font(font_path, decoration['font_size'])
+            for offset_x, offset_y in decoration.get('shadow_offsets', []):
+                _composite_text(layer, (x + offset_x, y + offset_y), decoration['text'], font, decoration['shadow_fill'])
+            _composite_text(layer, (x, y), decoration['text'], font, decoration['fill'])
+        elif decoration['type'] == 'image':
+            image = Image.open(decoration['path']).convert('RGBA')
+            opacity = decoration.get('opacity', 1.0)
+            if opacity < 1.0:
+                image.putalpha(image.split()[3].point(lambda p: int(p * opacity)))
+            layer.alpha_composite(image, dest=(x, y))
+        else:
+            raise ValueError(f"不明な装飾の種類です: {decoration['type']}")
+    return layer
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def _cache_key(decorations, video_size, font_path):
+    # 装飾の内容・画面サイズ・参照するファイル（フォントや画像）が変わったら作り直す
+    files = [_file_signature(font_path)] if os.path.exists(font_path) else [font_path]
+    files += [_file_signature(decoration['path']) for decoration in decorations if decoration['type'] == 'image']
+    payload = json.dumps({'decorations': decorations, 'video_size': list(video_size), 'files': files}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_static_layer(decorations, video_size, font_path, cache_dir=DEFAULT_CACHE_DIR):
+    """装飾を1枚のRGBAレイヤーにして (レイヤー, 貼り付け位置) を返す。結果はメモリとディスクにキャッシュする"""
+    key = _cache_key(decorations, video_size, font_path)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    cache_path = os.path.join(cache_dir, f"{key}.png")
+    if os.path.exists(cache_path):
+        layer = Image.open(cache_path).convert('RGBA')
+    else:
+        layer = rasterize_decorations(decorations, video_size, font_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        # 並列に描画するワーカーと書き込みが重ならないよう、一時ファイル経由で置き換える
+        fd, tmp_path = tempfile.mkstemp(suffix='.png', dir=cache_dir)
+        os.close(fd)
+        layer.save(tmp_path, format='PNG')
+        os.replace(tmp_path, cache_path)
+
+    bbox = layer.getbbox()
+    result = (layer.crop(bbox), bbox[:2]) if bbox else None
+    _memory_cache[key] = result
+    return result
@@ -0,0 +1,117 @@
+import argparse
+import hashlib
+import io
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+def synthesize_wav(text, frame_rate=44100, seconds_per_char=0.12, min_seconds=0.5):
+    """テキストから決まったWAVを作る（長さは文字数に比例し、音の高さはテキストのハッシュで決まる）"""
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    duration = max(min_seconds, len(text) * seconds_per_char)
+    frequency = 200 + digest[0] * 2
+    t = np.arange(int(duration * frame_rate)) / frame_rate
+    # 話し声のように音量を揺らす
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    samples = (np.sin(2 * np.pi * frequency * t) * envelope * 12000).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(frame_rate)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class StubTTSServer:
+    """音声APIの /voice の代わりに、決まったWAVを指定した遅延で返すローカルサーバー（ベンチマーク用）
+
+    latency 秒に、テキストのハッシュで決まる 0〜jitter 秒を足して待ってから返すので、同じ入力なら毎回同じ遅延になる。
+    """
+
+    def __init__(self, host='127.0.0.1', port=5000, latency=0.0, jitter=0.0, frame_rate=44100):
+        self.latency = latency
+        self.jitter = jitter
+        self.frame_rate = frame_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/voice':
+                    self.send_error(404)
+                    return
+                text = parse_qs(url.query).get('text', [''])[0]
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.delay(text))
+                body = synthesize_wav(text, server.frame_rate)
+                self.send_response(200)
+                self.send_header('Content-Type', 'audio/wav')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/voice"
+
+    def delay(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).digest()
+        return self.latency + self.jitter * digest[1] / 255
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        # 別スレッドで待ち受ける
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-tts', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='音声APIの代わりに決まったWAVを返すローカルサーバーを起動する')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=5000)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='1リクエストごとの遅延(秒)')
+    arg_parser.add_argument('--jitter', type=float, default=0.0, help='テキストごとに加える最大の遅延(秒)')
+    args = arg_parser.parse_args()
+    server = StubTTSServer(args.host, args.port, args.latency, args.jitter)
+    print(f"{server.url} で待ち受けています (Ctrl+C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,50 @@
+import threading
+from functools import lru_cache
+
+import budoux
+from PIL import ImageFont
+
+FONT_PATH = r"C:\Users\yuto9\Desktop\test-program1\auto_nanj_matome\GenEiNuGothic-EB_v1.1\GenEiNuGothic-EB.ttf"
+
+_layout_cache = {}
+_layout_cache_lock = threading.Lock()
+_LAYOUT_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def get_font(font_path, font_size):
+    # 同じフォントファイル・サイズは一度だけ読み込む
+    return ImageFont.truetype(font_path, font_size)
+
+
+@lru_cache(maxsize=1)
+def get_parser():
+    # BudouXのデフォルトの日本語パーサーは1つだけ作って使い回す
+    return budoux.load_default_japanese_parser()
+
+
+def layout_text(text, font, max_width):
+    """BudouXの区切りで max_width に収まるように折り返し、(行のタプル, 各行の幅のタプル) を返す"""
+    key = (text, font.path, font.size, max_width)
+    with _layout_cache_lock:
+        cached = _layout_cache.get(key)
+    if cached is not None:
+        return cached
+
+    lines = []
+    current_line = ""
+    for phrase in get_parser().parse(text):
+        test_line = current_line + phrase if current_line else phrase
+        if font.getlength(test_line) > max_width and current_line:
+            lines.append(current_line)
+            current_line = phrase
+        else:
+            current_line = test_line
+    lines.append(current_line)
+    result = (tuple(lines), tuple(font.getlength(line) for line in lines))
+
+    with _layout_cache_lock:
+        if len(_layout_cache) >= _LAYOUT_CACHE_SIZE:
+            _layout_cache.clear()
+        _layout_cache[key] = result
+    return result
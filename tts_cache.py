@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unicodedata
+
+from testengtokana2 import EnglishToKana, replace_english_to_kana
+
+DEFAULT_CACHE_DIR = os.path.join('cache', 'tts')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2GBを超えたら古いものから削除
+
+_e2k = None
+
+
+def prepare_tts_text(text):
+    # make_srt.py と make_audio.py で同じ読み上げテキストになるように変換をまとめる
+    global _e2k
+    if _e2k is None:
+        _e2k = EnglishToKana()
+    text = text.replace("AI", "エーアイ")  # AIをエーアイに変換
+    return replace_english_to_kana(text, _e2k)
+
+
+def normalize_text(text):
+    # キャッシュキー用に表記ゆれ（全角/半角や前後の空白）を吸収する
+    return unicodedata.normalize('NFKC', text).strip()
+
+
+class TTSCache:
+    """音声APIの結果(WAV)を (正規化テキスト + voice_apiパラメータ) をキーにディスクへ保存するキャッシュ"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, text, params):
+        # textはparamsから外し、正規化したものをキーに使う（model_idもparamsに含まれる）
+        key_params = {k: v for k, v in params.items() if k != 'text'}
+        payload = json.dumps({'text': normalize_text(text), 'params': key_params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def get(self, text, params, counts=None):
+        # counts ({'hits': 0, 'misses': 0}) を渡すと、キャッシュ全体とは別にその呼び出し元の分も数える
+        path = self.path_for(self.key(text, params))
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # 最終利用時刻を更新してLRUの順番に反映
+            except OSError:
+                pass
+            self._count('hits', counts)
+            return path
+        self._count('misses', counts)
+        return None
+
+    def _count(self, name, counts):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if counts is not None:
+                counts[name] = counts.get(name, 0) + 1
+
+    def put(self, text, params, content):
+        path = self.path_for(self.key(text, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        if not existed:
+            # 合計は置き換える前に数えておく（後で数えると新しいファイルを二重に足してしまう）
+            with self._lock:
+                self._current_total()
+        # 書き込み途中のファイルを読まれないように一時ファイル経由で置き換える
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, path)
+        if not existed:
+            with self._lock:
+                self._total_bytes += len(content)
+            self.evict(keep=path)
+        return path
+
+    def _current_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith('.wav'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self, keep=None):
+        with self._lock:
+            if self._current_total() <= self.max_bytes:
+                return
+            # 最終利用時刻が古いものから上限を下回るまで削除
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:  # 書き込んだばかりのファイルは残す
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._total_bytes = total
+
+    def stats(self, counts=None):
+        # counts を渡すとその件数の、渡さなければこのキャッシュ全体の件数とヒット率を返す
+        hits = counts.get('hits', 0) if counts is not None else self.hits
+        misses = counts.get('misses', 0) if counts is not None else self.misses
+        total = hits + misses
+        hit_rate = hits / total if total else 0.0
+        return {'hits': hits, 'misses': misses, 'hit_rate': hit_rate}
+
+    def report(self, label, counts=None):
+        # クライアントをステージやジョブで共有していても混ざらないよう、呼び出し元で数えた counts を表示できる
+        stats = self.stats(counts)
+        print(f"[{label}] TTSキャッシュ: ヒット {stats['hits']} / ミス {stats['misses']} (ヒット率 {stats['hit_rate']:.1%})")
+
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import perf_trace
+from tts_cache import TTSCache
+
+API_URL = "http://127.0.0.1:5000/voice"
+
+
+class TTSClient:
+    """音声APIへの接続を使い回し、複数の字幕を並列に音声化するクライアント"""
+
+    def __init__(self, api_url=API_URL, cache=None, max_workers=4, retries=3, backoff=0.5, timeout=120):
+        self.api_url = api_url
+        self.cache = cache if cache is not None else TTSCache()
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # keep-aliveの接続を並列数ぶんプールしておく
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _request(self, params):
+        status_code = None
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+                status_code = response.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                status_code = type(e).__name__
+            # 1回のリクエストにかかった時間（再試行はそれぞれ別に記録する）
+            perf_trace.complete('tts_request', started, time.perf_counter(), 'tts', status=status_code, attempt=attempt)
+            if status_code == 200:
+                return response.content, 200
+            if attempt < self.retries:
+                time.sleep(self.backoff * (2 ** attempt))  # 失敗するたびに待ち時間を倍にする
+        return None, status_code
+
+    def synthesize(self, text, params, counts=None):
+        # キャッシュにあればAPIを呼ばずにそのWAVのパスを返す（counts にはヒット・ミスの件数を足す）
+        params = params.copy()
+        params['text'] = text
+        cached_path = self.cache.get(text, params, counts)
+        if cached_path:
+            return cached_path, 200
+        content, status_code = self._request(params)
+        if content is None:
+            return None, status_code
+        return self.cache.put(text, params, content), 200
+
+    def synthesize_many(self, items, counts=None):
+        # items: (text, params) のリスト。結果は入力と同じ順番で返す
+        # 同じキャッシュキーになるもの（よくある返信など）は1回だけ音声化して、結果を全てに配る
+        keys = [self.cache.key(text, params) for text, params in items]
+        unique = dict(zip(keys, items))
+        if len(unique) <= 1 or self.max_workers <= 1:
+            results = {key: self.synthesize(text, params, counts) for key, (text, params) in unique.items()}
+        else:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tts')
+            results = dict(zip(unique, self._executor.map(lambda item: self.synthesize(*item, counts), unique.values())))
+        return [results[key] for key in keys]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()